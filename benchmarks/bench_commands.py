@@ -0,0 +1,175 @@
+'''Times every command on synthetic todo lists, in-process and through the CLI
+
+    python -m benchmarks.bench_commands [-o results.json] [--repeat R] [N ...]
+
+Each command runs R times after an untimed first run (which builds the
+caches), against a todo list of N tasks made by generate() in a git
+repository:
+  in-process  a new TodoList, then the method the command calls, in the
+              transaction and git batch of the CLI
+  cli         the click cli, in this process, with a new todo list
+refresh and compute_importance are timed alone, in-process. The results
+go to a JSON file, with the scaling exponent of each command between the
+smallest and the largest list: 1 is linear, 2 quadratic.
+'''
+import os, io, sys, json, math, time, argparse, itertools, importlib, platform, statistics, subprocess, tempfile
+from contextlib import redirect_stdout
+from datetime import datetime, timedelta
+from todo_modules.todolist import TodoList
+from .generate import generate
+
+VERSION = 1
+SIZES = [1000, 10000, 100000]
+CONFIG = {"default_sort": "urgency", "default_info": 0, "default_oneline": True, "default_limit": 10}
+MY_STATUS = 'bench'
+
+
+def report_range():
+    stop = datetime.now()
+    return stop - timedelta(days=30), stop
+
+
+def cli_args(command, workload, run):
+    '''The arguments of the CLI for a run of the command'''
+
+    if command == 'list': return []
+    if command == 'report': return ['report', '-r'] + [d.strftime(r'%Y-%m-%d') for d in report_range()]
+    if command == 'add': return ['add', '0', '-d', f'Benchmark task {run}']
+    if command == 'done': return ['done', str(workload['active'][run % len(workload['active'])])]
+    return [command]
+
+
+def call(todolist, command, workload, run):
+    '''What the CLI calls for the command, with its default options'''
+
+    if command == 'list': todolist.list('urgency', [], True, False, False, False, '', '', 10, 0, True)
+    elif command == 'prog': todolist.list_projects('urgency', 100, True, False, False, '', 0)
+    elif command == 'tree': todolist.tree('urgency', 100, True, False, 0)
+    elif command == 'report': todolist.report(report_range(), False, 0)
+    elif command == 'stats': todolist.stats()
+    elif command == 'priority': todolist.priority()
+    elif command == 'add': todolist.add(0, f'Benchmark task {run}\n', [], [], 1., None, None)
+    elif command == 'done': todolist.done(workload['active'][run % len(workload['active'])], None)
+    elif command == 'refresh': todolist.refresh()
+    elif command == 'compute_importance': todolist.compute_importance()
+
+
+COMMANDS = ['list', 'prog', 'tree', 'report', 'stats', 'priority', 'add', 'done']
+IN_PROCESS_ONLY = ['refresh', 'compute_importance']
+
+
+def run_in_process(path, command, workload, run):
+    if command == 'compute_importance':
+        todolist = TodoList(path)
+        start = time.perf_counter()
+        call(todolist, command, workload, run)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    todolist = TodoList(path, lazy=True)
+    with todolist.git.batch(), todolist.transaction(): call(todolist, command, workload, run)
+    return time.perf_counter() - start
+
+
+def run_cli(path, command, workload, run):
+    from click.testing import CliRunner
+    import todo
+
+    # As a new process would: the paths and the configuration are read again
+    importlib.reload(todo)
+    start = time.perf_counter()
+    result = CliRunner().invoke(todo.cli, cli_args(command, workload, run))
+    elapsed = time.perf_counter() - start
+
+    if result.exit_code != 0: sys.exit(f'todo {" ".join(cli_args(command, workload, run))} failed:\n{result.output}')
+    return elapsed
+
+
+def setup(home, n_tasks):
+    '''Generates a todo list of n_tasks in a new git repository, returns its path and workload'''
+
+    path = os.path.join(home, '.todolist', MY_STATUS)
+    os.makedirs(path)
+    generate(path, n_tasks)
+    with open(os.path.join(path, '.config.json'), 'w') as f: json.dump(CONFIG, f)
+
+    git = lambda *args: subprocess.run(['git', '-C', path] + list(args), check=True, capture_output=True)
+    git('init', '-q')
+    git('config', 'user.name', 'bench')
+    git('config', 'user.email', 'bench@localhost')
+    git('add', '-A')
+    git('commit', '-q', '-m', 'Synthetic todo list')
+
+    # The tasks `done` completes: one for each run, of each mode
+    with redirect_stdout(io.StringIO()): todolist = TodoList(path)
+    active = [t.iname for t in todolist.tasks if t.status == 'todo']
+    return path, {'tasks': n_tasks, 'projects': len(todolist.projects), 'active': active}
+
+
+def bench(n_tasks, repeat, commands):
+    '''Results of every command and mode on a todo list of n_tasks'''
+
+    results = []
+    with tempfile.TemporaryDirectory() as home:
+        os.environ['HOME'], os.environ['MY_STATUS'] = home, MY_STATUS
+        path, workload = setup(home, n_tasks)
+        runs = itertools.count()
+
+        for command in commands:
+            modes = [('in-process', run_in_process)]
+            if command not in IN_PROCESS_ONLY: modes.append(('cli', run_cli))
+
+            for mode, run in modes:
+                with redirect_stdout(io.StringIO()):
+                    times = [run(path, command, workload, next(runs)) for _ in range(repeat + 1)][1:]
+
+                results.append({
+                    'command': command, 'mode': mode, 'tasks': n_tasks, 'projects': workload['projects'],
+                    'best': min(times), 'median': statistics.median(times), 'times': times
+                })
+    return results
+
+
+def scaling(results):
+    '''Exponent k of time ~ tasks^k of each command and mode, from the smallest to the largest list'''
+
+    exponents = []
+    for command, mode in dict.fromkeys((r['command'], r['mode']) for r in results):
+        points = sorted((r['tasks'], r['best']) for r in results if (r['command'], r['mode']) == (command, mode))
+        (n0, t0), (n1, t1) = points[0], points[-1]
+        if n1 == n0 or min(t0, t1) <= 0: continue
+        exponents.append({'command': command, 'mode': mode, 'exponent': math.log(t1/t0)/math.log(n1/n0)})
+    return exponents
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Times the todo commands on synthetic todo lists')
+    parser.add_argument('sizes', type=int, nargs='*', default=SIZES, help='Numbers of tasks')
+    parser.add_argument('--repeat', '-r', type=int, default=3, help='Timed runs of each command')
+    parser.add_argument('--command', '-c', action='append', choices=COMMANDS + IN_PROCESS_ONLY, help='Only these commands')
+    parser.add_argument('--output', '-o', default='bench_commands.json', help='JSON results file')
+    args = parser.parse_args()
+
+    commands = args.command or COMMANDS + IN_PROCESS_ONLY
+    results = []
+    print(f'{"tasks":>8} {"command":20} {"mode":10} {"best [s]":>9} {"median [s]":>10}')
+    for n in args.sizes:
+        for r in bench(n, args.repeat, commands):
+            print(f'{n:8} {r["command"]:20} {r["mode"]:10} {r["best"]:9.3f} {r["median"]:10.3f}')
+            results.append(r)
+
+    exponents = scaling(results)
+    if len(set(args.sizes)) > 1:
+        print(f'\n{"command":20} {"mode":10} {"exponent":>8}')
+        for e in exponents: print(f'{e["command"]:20} {e["mode"]:10} {e["exponent"]:8.2f}')
+
+    with open(args.output, 'w') as f:
+        json.dump({
+            'version': VERSION,
+            'date': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'repeat': args.repeat,
+            'results': results,
+            'scaling': exponents
+        }, f, indent=1)
+    print(f'\nResults written to {args.output}')
@@ -0,0 +1,24 @@
+'''Times TodoList.compute_importance on synthetic todo lists
+
+    python -m benchmarks.bench_importance [N ...]
+'''
+import sys, time, tempfile
+from todo_modules.todolist import TodoList
+from .generate import generate
+
+
+def bench_importance(n_tasks):
+    with tempfile.TemporaryDirectory() as path:
+        generate(path, n_tasks)
+        todolist = TodoList(path)
+
+        start = time.perf_counter()
+        todolist.compute_importance()
+        return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    sizes = [int(n) for n in sys.argv[1:]] or [1000, 10000, 20000]
+    print(f'{"tasks":>8} {"importance [s]":>15}')
+    for n in sizes:
+        print(f'{n:8} {bench_importance(n):15.3f}')
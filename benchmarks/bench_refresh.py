@@ -0,0 +1,31 @@
+'''Times TodoList.refresh on synthetic todo lists
+
+    python -m benchmarks.bench_refresh [N ...]
+'''
+import sys, time, tempfile
+from todo_modules.todolist import TodoList
+from .generate import generate
+
+
+def bench_refresh(n_tasks):
+    with tempfile.TemporaryDirectory() as path:
+        generate(path, n_tasks)
+        todolist = TodoList(path, lazy=True)
+
+        start = time.perf_counter()
+        todolist.refresh()
+        cold = time.perf_counter() - start
+
+        start = time.perf_counter()
+        todolist.refresh()
+        warm = time.perf_counter() - start
+
+    return cold, warm
+
+
+if __name__ == '__main__':
+    sizes = [int(n) for n in sys.argv[1:]] or [1000, 10000, 50000]
+    print(f'{"tasks":>8} {"cold [s]":>10} {"cached [s]":>10}')
+    for n in sizes:
+        cold, warm = bench_refresh(n)
+        print(f'{n:8} {cold:10.3f} {warm:10.3f}')
@@ -0,0 +1,34 @@
+'''Times the urgency and due date computation, pure Python against NumPy
+
+    python -m benchmarks.bench_scoring [N ...]
+'''
+import sys, time, tempfile
+from todo_modules.todolist import TodoList
+from todo_modules import scoring
+from .generate import generate
+
+
+def bench_scoring(n_tasks):
+    with tempfile.TemporaryDirectory() as path:
+        generate(path, n_tasks)
+        todolist = TodoList(path)
+        projects, tasks = todolist.projects, todolist.tasks
+
+        start = time.perf_counter()
+        scoring.score_python(projects, tasks, projects, todolist.membership)
+        python = time.perf_counter() - start
+
+        np = scoring.numpy()
+        if np is None: return python, None
+
+        start = time.perf_counter()
+        scoring.score_numpy(np, projects, tasks, projects, todolist.table, todolist.membership)
+        return python, time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    sizes = [int(n) for n in sys.argv[1:]] or [1000, 10000, 20000]
+    print(f'{"tasks":>8} {"python [s]":>11} {"numpy [s]":>10}')
+    for n in sizes:
+        python, vectorized = bench_scoring(n)
+        print(f'{n:8} {python:11.3f} {"-" if vectorized is None else f"{vectorized:.3f}":>10}')
@@ -0,0 +1,42 @@
+'''Guards the import time of the CLI module
+
+    python -m benchmarks.bench_startup [budget in ms]
+
+Runs `python -X importtime -c "import todo"` and fails if importing takes
+longer than the budget, or if it pulls in modules that only the commands
+need.
+'''
+import os, sys, subprocess
+
+BUDGET_MS = 150
+DEFERRED = ['todo_modules.todolist', 'git', 'sqlite3', 'tkinter', 'asyncio', 'email', 'numpy']
+
+
+def import_times():
+    '''Returns {module: cumulative import time in us} for `import todo`'''
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, MY_STATUS=os.environ.get('MY_STATUS', 'bench'))
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import todo'],
+        cwd=root, env=env, capture_output=True, text=True, check=True)
+
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line: continue
+        _, cumulative, module = [field.strip() for field in line[len('import time:'):].split('|')]
+        times[module.strip()] = int(cumulative)
+    return times
+
+
+if __name__ == '__main__':
+    budget = float(sys.argv[1]) if len(sys.argv) > 1 else BUDGET_MS
+    times = import_times()
+
+    total = times['todo']/1000
+    print(f'import todo: {total:.1f} ms (budget {budget:.0f} ms)')
+    for module, us in sorted(times.items(), key=lambda m: -m[1])[:10]:
+        print(f'{us/1000:10.1f} ms  {module}')
+
+    loaded = [m for m in DEFERRED if m in times]
+    if loaded: sys.exit(f'imported at startup: {", ".join(loaded)}')
+    if total > budget: sys.exit(f'import todo exceeds the budget of {budget:.0f} ms')
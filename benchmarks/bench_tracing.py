@@ -0,0 +1,34 @@
+'''Measures the per-attribute overhead of the tracing wrappers
+
+    python -m benchmarks.bench_tracing [N]
+'''
+import sys, timeit, tempfile
+from todo_modules.todolist import TodoList
+from todo_modules import tracing
+from .generate import generate
+
+
+def per_access(todolist, number):
+    '''Nanoseconds per property read and per method call on a task'''
+
+    t = todolist.tasks[0]
+    attribute = timeit.timeit(lambda: t.status, number=number)/number
+    method = timeit.timeit(lambda: t.is_completed(), number=number)/number
+    return attribute*1e9, method*1e9
+
+
+if __name__ == '__main__':
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+
+    with tempfile.TemporaryDirectory() as path:
+        generate(path, 100)
+        off = per_access(TodoList(path), number)
+
+        # Tracing can only be switched on: measure it last
+        tracing.enable_tracing()
+        from todo_modules.todolist import TodoList as TracedTodoList
+        on = per_access(TracedTodoList(path), number)
+
+    print(f'{"":10} {"property [ns]":>14} {"method [ns]":>12}')
+    print(f'{"off":10} {off[0]:14.0f} {off[1]:12.0f}')
+    print(f'{"on":10} {on[0]:14.0f} {on[1]:12.0f}')
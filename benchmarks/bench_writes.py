@@ -0,0 +1,71 @@
+'''Counts the files that read-only commands write, for each storage backend
+
+    python -m benchmarks.bench_writes [N]
+
+Each command runs twice on a synthetic todo list of N tasks. The files of
+the todo list directory are compared before and after each run, by inode,
+size, mtime and content: a write is seen whatever makes it (the storage,
+filesIO, sqlite, os.replace). The first run may build the caches; the
+repeat must write nothing, else the exit status is 1.
+'''
+import os, sys, json, zlib, tempfile, importlib
+from todo_modules.storage import BACKENDS
+from .generate import generate
+
+COMMANDS = [[], ['-c'], ['prog'], ['tree'], ['stats'], ['show', '1']]
+CONFIG = {"default_sort": "urgency", "default_info": 0, "default_oneline": True, "default_limit": 10}
+
+
+def snapshot(path):
+    '''{file: (inode, size, mtime, crc32)} of every file under path'''
+
+    files = {}
+    for directory, _, names in os.walk(path):
+        for name in names:
+            file = os.path.join(directory, name)
+            stat = os.stat(file)
+            with open(file, 'rb') as f: crc = zlib.crc32(f.read())
+            files[os.path.relpath(file, path)] = (stat.st_ino, stat.st_size, stat.st_mtime_ns, crc)
+    return files
+
+
+def written(before, after):
+    '''The files created, changed or removed between two snapshots'''
+    return sorted(f for f in before.keys() | after.keys() if before.get(f) != after.get(f))
+
+
+def count_writes(n_tasks, backend):
+    from click.testing import CliRunner
+
+    with tempfile.TemporaryDirectory() as home:
+        path = os.path.join(home, '.todolist', 'bench')
+        os.makedirs(path)
+        generate(path, n_tasks, storage=BACKENDS[backend](path))
+        with open(os.path.join(path, '.config.json'), 'w') as f: json.dump(CONFIG, f)
+
+        os.environ['HOME'], os.environ['MY_STATUS'] = home, 'bench'
+        results = {}
+        for args in COMMANDS:
+            for run in ['first', 'repeat']:
+                import todo; importlib.reload(todo)
+
+                before = snapshot(path)
+                result = CliRunner().invoke(todo.cli, args)
+                if result.exit_code != 0: sys.exit(f'todo {" ".join(args)} failed:\n{result.output}')
+                results[(' '.join(['todo'] + args), run)] = written(before, snapshot(path))
+
+    return results
+
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    failed = False
+    print(f'{"backend":8} {"command":12} {"first":>6} {"repeat":>6}')
+    for backend in BACKENDS:
+        results = count_writes(n, backend)
+        for args in COMMANDS:
+            command = ' '.join(['todo'] + args)
+            first, repeat = results[(command, 'first')], results[(command, 'repeat')]
+            print(f'{backend:8} {command:12} {len(first):6} {len(repeat):6}  {" ".join(repeat)}')
+            failed = failed or bool(repeat)
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,111 @@
+'''Checks that the fast paths of refresh derive what a cold full refresh does
+
+    python -m benchmarks.check_paths [N]
+
+On a synthetic todo list of N tasks, a few tasks and projects are changed
+on disk, then the derived fields (projects, dependencies, due dates,
+urgency, importance) are compared against a refresh without cache, scored
+in pure Python:
+  incremental  a refresh using the cache written before the changes
+  numpy        a refresh without cache, scored with NumPy (if installed)
+  reload       TodoList.reload of the changes the watcher saw, as the
+               daemon does before each command
+Exits with status 1 if any of them differs.
+'''
+import io, os, sys, math, tempfile
+from contextlib import redirect_stdout
+from todo_modules.todolist import TodoList
+from todo_modules.storage import JsonStorage, TASK, PROJECT
+from todo_modules.cache import DerivedCache
+from todo_modules.watcher import Watcher
+from todo_modules import scoring
+from .generate import generate, num2str
+
+
+def load(path, numpy=False, cache=True):
+    '''A todo list read from path, scored with NumPy or in pure Python'''
+
+    if not cache and os.path.exists(os.path.join(path, DerivedCache.FILENAME)):
+        os.remove(os.path.join(path, DerivedCache.FILENAME))
+
+    scoring.NUMPY_MIN_TASKS, default = (0 if numpy else math.inf), scoring.NUMPY_MIN_TASKS
+    try:
+        with redirect_stdout(io.StringIO()): return TodoList(path)
+    finally: scoring.NUMPY_MIN_TASKS = default
+
+
+def snapshot(todolist):
+    '''The derived fields of every task and project'''
+
+    return {
+        TASK: {t.name: (sorted(t.projects), sorted(t.following), t.due, t.urgency, t.importance) for t in todolist.tasks},
+        PROJECT: {p.name: (p.urgency, p.due, todolist.membership.is_active(p.name)) for p in todolist.projects}
+    }
+
+
+def change(path, n_tasks):
+    '''Edits some tasks and projects on disk, as a pull or another shell would'''
+
+    storage = JsonStorage(path)
+    n_projects = len(storage.names(PROJECT))
+
+    for i in range(0, n_tasks, max(n_tasks//20, 1)):
+        info = storage.read(TASK, num2str(i))
+        info['status'] = 'todo' if info['status'] != 'todo' else 'done'
+        info['completed'] = '2024-01-01' if info['status'] == 'done' else None
+        info['project'] = num2str((int(info['project']) + 1) % n_projects)
+        info['followers'] = [num2str((i + 7) % n_tasks)] if not info['followers'] else []
+        info['time'] = info['time'] * 2
+        storage.write(TASK, num2str(i), info)
+
+    for i in range(0, n_projects, max(n_projects//5, 1)):
+        info = storage.read(PROJECT, num2str(i))
+        info['due'] = '2030-06-01'
+        info['importance'] = 1000 - info['importance']
+        storage.write(PROJECT, num2str(i), info)
+
+
+def differences(expected, actual):
+    '''The (kind, name) whose derived fields differ, floats compared with a tolerance'''
+
+    def same(a, b):
+        if isinstance(a, float) or isinstance(b, float): return a == b or math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-9)
+        if isinstance(a, tuple): return len(a) == len(b) and all(same(x, y) for x, y in zip(a, b))
+        return a == b
+
+    return [(kind, name) for kind in (TASK, PROJECT) for name in expected[kind].keys() | actual[kind].keys()
+        if name not in expected[kind] or name not in actual[kind] or not same(expected[kind][name], actual[kind][name])]
+
+
+def check(n_tasks):
+    '''Runs every path on a todo list of n_tasks, returns {path: differences or None if skipped}'''
+
+    results = {}
+    with tempfile.TemporaryDirectory() as path:
+        generate(path, n_tasks)
+        loaded = load(path)
+        watcher = Watcher(loaded.storage)
+
+        change(path, n_tasks)
+        results['incremental'] = snapshot(load(path))
+        with redirect_stdout(io.StringIO()): loaded.reload(watcher.changes())
+        results['reload'] = snapshot(loaded)
+        watcher.close()
+
+        results['numpy'] = snapshot(load(path, numpy=True, cache=False)) if scoring.numpy() else None
+        expected = snapshot(load(path, cache=False))
+
+    return {name: None if result is None else differences(expected, result) for name, result in results.items()}
+
+
+if __name__ == '__main__':
+    n_tasks = int(sys.argv[1]) if sys.argv[1:] else 2000
+    failed = False
+    for label, different in check(n_tasks).items():
+        if different is None: print(f'{label:12} skipped')
+        elif not different: print(f'{label:12} ok')
+        else:
+            failed = True
+            examples = ' '.join(f'{kind} {name}' for kind, name in sorted(different)[:5])
+            print(f'{label:12} {len(different)} differ, e.g. {examples}')
+    sys.exit(1 if failed else 0)
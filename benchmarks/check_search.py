@@ -0,0 +1,47 @@
+'''Checks that indexed searches find what a scan of every description does
+
+    python -m benchmarks.check_search [N]
+
+Runs each query, in each match mode and case, through SearchIndex.find on
+a synthetic todo list of N tasks, and compares the result with a plain
+scan. Exits with status 1 if any of them differs.
+'''
+import sys, tempfile
+from todo_modules.search import SearchIndex, matcher, MATCHES, REGEX
+from todo_modules.storage import JsonStorage, TASK
+from .generate import generate
+
+QUERIES = ['Task 1', 'task 12', 'synthetic', 'of a', 'Task 1 of', 'nothing like it']
+PATTERNS = [
+    r'Task 1\d of', r'(?P<n>Task) 1', r'(?!xyz)Task 1', r'(?=Task)Task 1', r'(?i)TASK 7',
+    r'\x54ask 3', r'Task 3', r'\124ask 3', r'Task (1|2)0 of', r'(Task )?1 of', r'[T]ask 4\b',
+    r'Ta(sk)+ 5', r'Task \d{3} of', r'syn.hetic', r'(?x) Task \s 9', r'Tas[\]k]'
+]
+
+
+def check(n_tasks):
+    '''Returns the (query, match, ignore_case) whose indexed and scanned results differ'''
+
+    different = []
+    with tempfile.TemporaryDirectory() as path:
+        generate(path, n_tasks)
+        texts = {name: info['description'] for name, info in JsonStorage(path).load_all(TASK).items()}
+        index = SearchIndex(path)
+
+        for match in MATCHES:
+            for query in QUERIES + (PATTERNS if match == REGEX else []):
+                for ignore_case in (False, True):
+                    matches = matcher(query, match, ignore_case)
+                    expected = {name for name, text in texts.items() if matches(text)}
+                    if index.find(TASK, texts, query, match, ignore_case) != expected:
+                        different.append((query, match, ignore_case))
+    return different
+
+
+if __name__ == '__main__':
+    n_tasks = int(sys.argv[1]) if sys.argv[1:] else 2000
+    different = check(n_tasks)
+    for query, match, ignore_case in different:
+        print(f'{match:10} {"ignore case" if ignore_case else "":11} {query!r} differs')
+    print(f'{len(different)} of the searches differ' if different else 'ok')
+    sys.exit(1 if different else 0)
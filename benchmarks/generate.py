@@ -0,0 +1,49 @@
+import random
+from datetime import date, timedelta
+from todo_modules.storage import JsonStorage, TASK, PROJECT
+
+
+def num2str(i):
+    return f'{i:04}'
+
+
+def generate(path, n_tasks, n_projects=None, seed=0, storage=None):
+    '''Writes a deterministic synthetic todo list into path'''
+
+    rng = random.Random(seed)
+    if n_projects is None: n_projects = max(n_tasks//50, 1)
+    if storage is None: storage = JsonStorage(path)
+
+    today = date.today()
+    def day(offset): return (today + timedelta(days=offset)).strftime(r"%Y-%m-%d")
+
+    entities = []
+    for i in range(n_projects):
+        parent = num2str(rng.randrange(i)) if i and rng.random() < 0.5 else ''
+        entities.append((PROJECT, num2str(i), {
+            'description': f'Project {i}\n',
+            'importance': rng.randint(1, 999),
+            'due': day(rng.randint(-30, 365)),
+            'created': day(-rng.randint(0, 730)),
+            'parent': parent,
+            'reference': ''
+        }))
+
+    for i in range(n_tasks):
+        created = -rng.randint(0, 730)
+        status = rng.choices(['todo', 'in-progress', 'done', 'del'], weights=[20, 2, 70, 8])[0]
+        followers = [num2str(i + 1)] if i + 1 < n_tasks and rng.random() < 0.3 else []
+
+        entities.append((TASK, num2str(i), {
+            'description': f'Task {i} of a synthetic todo list\n',
+            'status': status,
+            'followers': followers,
+            'project': num2str(rng.randrange(n_projects)),
+            'time': rng.choice([0.5, 1, 2, 4, 8]),
+            'created': day(created),
+            'completed': day(rng.randint(created, 0)) if status == 'done' else None,
+            'deleted': day(rng.randint(created, 0)) if status == 'del' else None
+        }))
+
+    # One transaction for a database
+    storage.write_many(entities)
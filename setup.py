@@ -6,8 +6,9 @@ setup(
     py_modules=["todo"],
     include_package_data=True,
     install_requires=["click", "GitPython"],
+    extras_require={"numpy": ["numpy"]},
     entry_points="""
         [console_scripts]
-        todo=todo:cli
+        todo=todo_modules.client:main
     """,
 )
@@ -1,10 +1,9 @@
-from email.policy import default
-from operator import sub
 from todo_modules.utilities import print, filesIO
 from todo_modules.utilities import excludes, validate, never, now
 from todo_modules.utilities import logger
-from todo_modules.todolist import TodoList
+from todo_modules.tracing import enable_tracing, tracing_requested
 import os, click, sys
+from datetime import timedelta
 
 # logger.set_state_debug()
 # logger.activate_IO()
@@ -20,21 +19,65 @@ TODOLIST_PATH = os.path.join(HOME, '.todolist')
 TODOLIST_PATH = os.path.join(TODOLIST_PATH, MY_STATUS)
 CONFIG = os.path.join(TODOLIST_PATH, '.config.json')
 
-todolist = TodoList(TODOLIST_PATH)
-config = filesIO.read(CONFIG, loads=True, fail_silently=True)
+# Nothing is loaded at import time: the todo list and the configuration 
+# are read by the commands that need them
+_todolist = None
+_config = None
 
-if config == 'failed':
-	DEFAULT_CONFIG = os.path.join(HOME, '.myconfig/todo/config.json')
-	filesIO.copy(DEFAULT_CONFIG, CONFIG)
-	config = filesIO.read(CONFIG, loads=True)
 
-DEFAULT_SORT = config['default_sort']
-DEFAULT_INFO = config['default_info']
-DEFAULT_ONELINE = config['default_oneline']
-DEFAULT_LIMIT = config['default_limit']
+def get_todolist():
+	global _todolist
 
+	if _todolist is None:
+		from todo_modules.todolist import TodoList
+		_todolist = TodoList(TODOLIST_PATH, lazy=True)
 
-@click.group(invoke_without_command=True)
+	return _todolist
+
+
+def reset_todolist():
+	'''Drops the todo list kept in memory: the next command reads it again'''
+	global _todolist
+	_todolist = None
+
+
+def get_config(key, default=None):
+	global _config
+
+	if _config is None:
+		_config = filesIO.read(CONFIG, loads=True, fail_silently=True)
+
+	if _config == 'failed':
+		DEFAULT_CONFIG = os.path.join(HOME, '.myconfig/todo/config.json')
+		if not os.path.isdir(TODOLIST_PATH): filesIO.mkdir(TODOLIST_PATH)
+		filesIO.copy(DEFAULT_CONFIG, CONFIG)
+		_config = filesIO.read(CONFIG, loads=True)
+
+	if default is not None: return _config.get(key, default)
+	return _config[key]
+
+
+DEFAULT_SORT = lambda: get_config('default_sort')
+DEFAULT_INFO = lambda: get_config('default_info')
+DEFAULT_ONELINE = lambda: get_config('default_oneline')
+DEFAULT_LIMIT = lambda: get_config('default_limit')
+DEFAULT_ARCHIVE_DAYS = lambda: get_config('archive_after_days', 90)
+
+
+class TodoCommand(click.Command):
+	'''Runs the command inside a single todolist transaction and git commit'''
+
+	def invoke(self, ctx):
+		todolist = get_todolist()
+		with todolist.git.batch(), todolist.transaction():
+			return super().invoke(ctx)
+
+
+class TodoGroup(click.Group):
+	command_class = TodoCommand
+
+
+@click.group(cls=TodoGroup, invoke_without_command=True)
 @click.pass_context
 @click.option('--logging-info', is_flag=True, help='Set logging to info', hidden=True)
 @click.option('--logging-debug', is_flag=True, help='Set logging to debug', hidden=True)
@@ -49,11 +92,14 @@ DEFAULT_LIMIT = config['default_limit']
 @click.option('--waiting / --no-waiting', '-w / -W', is_flag=True, default=False, help='Include scheduled tasks')
 @click.option('--filter', '-f', default='', help='Filter by match in description')
 @click.option('--filter-project', '-F', default='', help="Filter by match in project's description")
-@click.option('--limit', '-l', default=DEFAULT_LIMIT, help='Limit the number of results')
+@click.option('--match', default='substring', type=click.Choice(['substring', 'word', 'regex']), help='How filters match')
+@click.option('--ignore-case', is_flag=True, help='Filters ignore case')
+@click.option('--limit', '-l', type=int, default=DEFAULT_LIMIT, help='Limit the number of results')
 @click.option('--no-limit', '-L', is_flag=True, help='Show all the results')
+@click.option('--offset', type=click.IntRange(min=0), default=0, help='Skip the first results')
 @click.option('--one-line / --multi-line', '-o / -O', is_flag=True, default=DEFAULT_ONELINE, help='Short output')
 def cli(ctx, logging_info, logging_debug, logging_io, indent, sort, project, active, 
-		completed, deleted, waiting, filter, filter_project, limit, no_limit, info, one_line):
+		completed, deleted, waiting, filter, filter_project, match, ignore_case, limit, no_limit, offset, info, one_line):
 	'''See all your tasks'''
 
 	# Validate input
@@ -68,10 +114,12 @@ def cli(ctx, logging_info, logging_debug, logging_io, indent, sort, project, act
 	elif logging_info: logger.set_state_info()    
 	if logging_io: logger.activate_IO()
 	if indent: print.auto_indent()
+	if any([logging_debug, logging_info, logging_io]) or tracing_requested(): enable_tracing()
 
 	# List the task, if no sub-command is specified
 	if ctx.invoked_subcommand is None:
-		todolist.list(sort, projects, active, completed, deleted, waiting, filter, filter_project, limit, info, one_line)
+		get_todolist().list(sort, projects, active, completed, deleted, waiting, filter, filter_project, limit, info, one_line,
+			match=match, ignore_case=ignore_case, offset=offset)
 
 
 @cli.command(no_args_is_help=True)
@@ -89,7 +137,7 @@ def add(project, description, after, before, time, wait, commit):
 	after  = list(set(after))
 	before = list(set(before))
 
-	todolist.add(project, description, after, before, time, wait, commit)
+	get_todolist().add(project, description, after, before, time, wait, commit)
 
 
 @cli.command()
@@ -106,7 +154,7 @@ def addp(due, no_due, description, importance, milestone_of, reference, commit):
 	# Manipulate input
 	if no_due: due = never(date=True)
 
-	todolist.add_project(due, description, importance, milestone_of, reference, commit)
+	get_todolist().add_project(due, description, importance, milestone_of, reference, commit)
 
 
 @cli.command()
@@ -114,39 +162,44 @@ def addp(due, no_due, description, importance, milestone_of, reference, commit):
 @click.option('--sort', '-s', default=DEFAULT_SORT, type=click.Choice(['urgency', 'U', 'importance', 'I', 'creation', 'C']), help='Order by')
 @click.option('--limit', '-l', type=int, default=100, help='Limit the number of results')
 @click.option('--no-limit', '-L', is_flag=True, default=False, help='Show all the results')
+@click.option('--offset', type=click.IntRange(min=0), default=0, help='Skip the first results')
 @click.option('--active / --no-active', '-a / -A', is_flag=True, default=True, help='Include active projects')
 @click.option('--completed / --no-completed', '-c / -C', is_flag=True, default=False, help='Include completed projects')
 @click.option('--milestones / --no-milestones', '-m / -M', is_flag=True, default=False, help='Include milestones projects')
 @click.option('--filter', '-f', default='', help='Filter by match in description')
+@click.option('--match', default='substring', type=click.Choice(['substring', 'word', 'regex']), help='How the filter matches')
+@click.option('--ignore-case', is_flag=True, help='The filter ignores case')
 @click.option('--info', '-i', default=DEFAULT_INFO, count=True, help='Show info')
-def prog(project_id, sort, limit, no_limit, active, completed, milestones, filter, info):
+def prog(project_id, sort, limit, no_limit, offset, active, completed, milestones, filter, match, ignore_case, info):
 	'''List all the projects'''
 
 	# Manipulate input
 	if no_limit: limit = 10000
 	
-	todolist.list_projects(sort, limit, active, completed, milestones, filter, info, project_id if project_id else None)
+	get_todolist().list_projects(sort, limit, active, completed, milestones, filter, info, project_id if project_id else None,
+		match=match, ignore_case=ignore_case, offset=offset)
 
 
 @cli.command()
 @click.argument('project-id', type=int, nargs=-1)
 @click.option('--sort', '-s', default=DEFAULT_SORT, type=click.Choice(['urgency', 'U', 'importance', 'I', 'creation', 'C']), help='Order by')
-@click.option('--limit', '-l', type=int, default=100, help='Limit the number of results')
-@click.option('--no-limit', '-L', is_flag=True, default=False, help='Show all the results')
+@click.option('--limit', '-l', type=int, default=100, help='Ignored: the tree shows every project')
+@click.option('--no-limit', '-L', is_flag=True, default=False, help='Ignored: the tree shows every project')
 @click.option('--active / --no-active', '-a / -A', is_flag=True, default=True, help='Include active projects')
 @click.option('--completed / --no-completed', '-c / -C', is_flag=True, default=False, help='Include completed projects')
+@click.option('--depth', '-d', type=click.IntRange(min=0), default=None, help='Show milestones down to this depth')
 @click.option('--info', '-i', default=DEFAULT_INFO, count=True, help='Show info')
-def tree(project_id, sort, limit, no_limit, active, completed, info):
+def tree(project_id, sort, limit, no_limit, active, completed, depth, info):
 	'''List all the projects'''
 
 	# Manipulate input
 	if no_limit: limit = 10000
 	
 	if project_id:
-		for project in project_id: todolist.tree(sort, limit, active, completed, info, project=project)
+		for project in project_id: get_todolist().tree(sort, limit, active, completed, info, project=project, depth=depth)
 	
 	else: 
-		todolist.tree(sort, limit, active, completed, info)
+		get_todolist().tree(sort, limit, active, completed, info, depth=depth)
 
 
 @cli.command(no_args_is_help=True)
@@ -155,7 +208,7 @@ def tree(project_id, sort, limit, no_limit, active, completed, info):
 def doing(task_id, commit):
 	'''Mark a task as in-progress'''
 
-	for task in task_id: todolist.doing(task, commit)
+	for task in task_id: get_todolist().doing(task, commit)
 
 
 @cli.command(no_args_is_help=True)
@@ -166,9 +219,9 @@ def done(task_id, time, commit):
 	'''Mark a task as completed'''
 
 	if time is not None:
-		for task in task_id: todolist.edit(task, None, time, None, [], [], True, commit)
+		for task in task_id: get_todolist().edit(task, None, time, None, [], [], True, commit)
 
-	for task in task_id: todolist.done(task, commit)
+	for task in task_id: get_todolist().done(task, commit)
 
 
 @cli.command(no_args_is_help=True)
@@ -177,7 +230,7 @@ def done(task_id, time, commit):
 def restore(task_id, commit):
 	'''Restore a completed or deleted task'''
 
-	for task in task_id: todolist.restore(task, commit)
+	for task in task_id: get_todolist().restore(task, commit)
 
 
 @cli.command(no_args_is_help=True)
@@ -187,7 +240,16 @@ def restore(task_id, commit):
 def delete(task_id, commit):
 	'''Delete a task'''
 
-	todolist.delete(task_id, commit)
+	get_todolist().delete(task_id, commit)
+
+
+@cli.command()
+@click.option('--days', '-n', type=click.IntRange(min=0), default=DEFAULT_ARCHIVE_DAYS, help='Archive the tasks completed or deleted more than this many days ago')
+@click.option('--git', '-g', 'commit', type=str, help='Git commit message')
+def archive(days, commit):
+	'''Move old completed and deleted tasks to the compressed archive'''
+
+	get_todolist().archive_tasks(days, commit)
 
 
 @cli.command(no_args_is_help=True)
@@ -197,7 +259,7 @@ def delete(task_id, commit):
 def deletep(project_id, commit):
 	'''Delete a project'''
 
-	todolist.delete(project_id, commit)
+	get_todolist().delete(project_id, commit)
 
 
 @cli.command(no_args_is_help=True)
@@ -220,7 +282,7 @@ def edit(task_id, project, time, wait, after, before, override, commit):
 	validate(excludes(after, project), 'cannot modify project and dependencies at the same time')
 	validate(excludes(before, project), 'cannot modify project and dependencies at the same time')
 
-	todolist.edit(task_id, project, time, wait, after, before, override, commit)
+	get_todolist().edit(task_id, project, time, wait, after, before, override, commit)
 
 
 @cli.command(no_args_is_help=True)
@@ -241,7 +303,7 @@ def editp(project_id, due, delete_due, importance, milestone_of, delete_parent,
 	# Manipulate input
 	if delete_due: due = never()
 
-	todolist.edit_project(project_id, due, importance, milestone_of, delete_parent, reference, commit)
+	get_todolist().edit_project(project_id, due, importance, milestone_of, delete_parent, reference, commit)
 
 
 @cli.command(no_args_is_help=True)
@@ -252,7 +314,7 @@ def wait(task_id, date, commit):
 	'''Wait to create the task'''
 
 	for task in task_id: 
-		todolist.edit(task, None, None, date, [], [], False, commit)
+		get_todolist().edit(task, None, None, date, [], [], False, commit)
 
 
 @cli.command(no_args_is_help=True)
@@ -260,7 +322,7 @@ def wait(task_id, date, commit):
 def show(task_id):
 	'''Show all info about the task'''
 
-	todolist.show(task_id)
+	get_todolist().show(task_id)
 	
 
 @cli.command(no_args_is_help=True)
@@ -268,14 +330,14 @@ def show(task_id):
 def showp(project_id):
 	'''Show all info about the project'''
 
-	todolist.show_project(project_id)
+	get_todolist().show_project(project_id)
 
 
 @cli.command()
 def priority():
 	'''Compute projects priorities'''
 
-	todolist.priority()
+	get_todolist().priority()
 
 
 @cli.command(no_args_is_help=True)
@@ -283,7 +345,7 @@ def priority():
 @click.option('--today', '-t', is_flag=True, help='Date is today')
 @click.option('--yesterday', '-y', is_flag=True, help='Date is yesterday')
 @click.option('--range', '-r', default=None, type=(click.DateTime(formats=[r'%Y-%m-%d', r'%m-%d']), click.DateTime(formats=[r'%Y-%m-%d', r'%m-%d', ])), help='Report date range')
-@click.option('--machine', '-m', is_flag=True, help='Machine-readable output format')
+@click.option('--machine', '-m', is_flag=True, help='Machine-readable output: date, ID, P-ID, time and description, tab separated')
 @click.option('--info', '-i', default=DEFAULT_INFO, count=True, help='Show info')
 def report(date, today, yesterday, range, machine, info):
 	'''Create a report of completed tasks on a specific date'''
@@ -295,29 +357,68 @@ def report(date, today, yesterday, range, machine, info):
 
 	# Data manipulation
 	if today: date = now(date=True)
-	if yesterday: print("--yesterday not yet implemented"); return
-	if machine: print("--machine not yet implemented"); return
+	if yesterday: date = now(date=True) - timedelta(days=1)
 	if not range: range = (date, date)
 
-	todolist.report(range, machine, info)
+	get_todolist().report(range, machine, info)
 
 
 @cli.command()
 def stats():
 	'''Stats about the todo list'''
 
-	todolist.stats()
+	get_todolist().stats()
+
+
+@cli.command(name='export')
+@click.argument('file', type=click.Path(dir_okay=False, allow_dash=True), default='-')
+@click.option('--format', '-f', 'format', type=click.Choice(['jsonl', 'csv']), help='Record format [default: from the file extension, else jsonl]')
+def export(file, format):
+	'''Write every task and project as JSONL or CSV records'''
+
+	from todo_modules import transfer
+	get_todolist().export(file, format or transfer.guess_format(file))
+
+
+@cli.command(name='import', no_args_is_help=True)
+@click.argument('file', type=click.Path(exists=True, dir_okay=False, allow_dash=True))
+@click.option('--format', '-f', 'format', type=click.Choice(['jsonl', 'csv']), help='Record format [default: from the file extension, else jsonl]')
+@click.option('--git', '-g', 'commit', type=str, help='Git commit message')
+def import_(file, format, commit):
+	'''Add the tasks and projects of a JSONL or CSV file of records'''
+
+	from todo_modules import transfer
+	get_todolist().import_records(file, format or transfer.guess_format(file), commit)
 
 
 @cli.command()
 def push():
     '''Push the todolist to remote'''
     
-    todolist.git.push()
+    get_todolist().git.push()
 
 
 @cli.command()
 def pull():
     '''Pull the todolist from remote'''
     
-    todolist.git.pull()
+    get_todolist().git.pull()
+
+
+@cli.command(cls=click.Command)
+def serve():
+	'''Keep the todolist in memory and run the commands of other shells'''
+
+	# Not a TodoCommand: each command served runs in its own transaction
+	from todo_modules import daemon
+	daemon.serve(TODOLIST_PATH, cli, get_todolist, reset_todolist)
+
+
+@cli.command(no_args_is_help=True)
+@click.argument('backend', type=click.Choice(['json', 'sharded', 'sqlite']))
+@click.option('--keep', '-k', is_flag=True, help='Keep the current storage (e.g. export to json for git diffs)')
+@click.option('--git', '-g', 'commit', type=str, help='Git commit message')
+def migrate(backend, keep, commit):
+	'''Convert the todolist to another storage backend'''
+
+	get_todolist().migrate(backend, keep, commit)
@@ -0,0 +1,120 @@
+import os, json, gzip
+from .utilities import filesIO
+
+
+class Archive():
+    '''Completed and deleted tasks moved out of the todo list, in compressed segments
+
+    Each archiving writes a new segment, archive/<n>.jsonl.gz, never modified
+    afterwards: a task in a newer segment replaces its copy in the older ones,
+    and a task back in the todo list (restored, edited) replaces the archived
+    one. The index, archive/index.json, lists the segments and counts the
+    archived tasks of each project, so that project statuses do not need to
+    open the segments.
+    '''
+
+    VERSION = 1
+    DIRECTORY = 'archive'
+    FILENAME = 'index.json'
+
+    def __init__(self, path):
+        self.directory = os.path.join(path, Archive.DIRECTORY)
+        self.path = os.path.join(self.directory, Archive.FILENAME)
+        self._index = None
+        self._stamp = None
+        self._tasks = None
+        self.dirty = False
+
+
+    def __str__(self):
+        return f'<Archive {self.directory}>'
+
+
+    def __repr__(self):
+        return f'<Archive {self.directory}>'
+
+
+    def _stat(self):
+        try: stat = os.stat(self.path)
+        except OSError: return None
+        return [stat.st_mtime_ns, stat.st_size]
+
+
+    @property
+    def index(self):
+        if self._index is None:
+            data = filesIO.read(self.path, loads=True, fail_silently=True) if os.path.isfile(self.path) else None
+            if not isinstance(data, dict) or data.get('version') != Archive.VERSION:
+                data = {'version': Archive.VERSION, 'segments': [], 'next': 0, 'projects': {}}
+            self._index = data
+            self._stamp = self._stat()
+        return self._index
+
+
+    def changed(self):
+        '''Whether someone else wrote the archive since it was read'''
+        return self._index is not None and self._stat() != self._stamp
+
+
+    def forget(self):
+        self._index = self._tasks = None
+        self.dirty = False
+
+
+    def tasks(self):
+        '''{name: info} of the archived tasks, read from the segments on first use'''
+
+        if self._tasks is None:
+            self._tasks = {}
+            for segment in self.index['segments']:
+                with gzip.open(os.path.join(self.directory, segment), 'rt') as f:
+                    for line in f:
+                        record = json.loads(line)
+                        self._tasks[record['name']] = record['info']
+        return self._tasks
+
+
+    def has_tasks(self, project_name):
+        return self.index['projects'].get(project_name, 0) > 0
+
+
+    def append(self, tasks):
+        '''Writes the (name, info) of the given tasks in a new segment'''
+
+        index = self.index
+        os.makedirs(self.directory, exist_ok=True)
+        segment = f'{len(index["segments"]):04d}.jsonl.gz'
+        path = os.path.join(self.directory, segment)
+
+        # Write aside and rename: the index never lists a half written segment
+        with gzip.open(path + '.tmp', 'wt') as f:
+            for name, info in tasks: f.write(json.dumps({'name': name, 'info': info}) + '\n')
+        os.replace(path + '.tmp', path)
+
+        index['segments'].append(segment)
+        for name, info in tasks:
+            index['next'] = max(index['next'], int(name) + 1)
+            index['projects'][info['project']] = index['projects'].get(info['project'], 0) + 1
+            if self._tasks is not None: self._tasks[name] = info
+        self.dirty = True
+        return self.save()
+
+
+    def unarchive(self, name):
+        '''Stops counting an archived task, written again in the todo list'''
+
+        project = self.tasks()[name]['project']
+        self.index['projects'][project] -= 1
+        if not self.index['projects'][project]: del self.index['projects'][project]
+        self.dirty = True
+
+
+    def save(self):
+        '''Writes the index if it changed, returns its path or None'''
+
+        if not self.dirty: return None
+        filesIO.write(self.path + '.tmp', self.index, dumps=True)
+        os.replace(self.path + '.tmp', self.path)
+        self._stamp = self._stat()
+        self.dirty = False
+        return self.path
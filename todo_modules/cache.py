@@ -0,0 +1,130 @@
+import os
+from .utilities import filesIO, now, git_ignore
+from .storage import TASK, PROJECT, KINDS
+from .graph import connected
+
+
+class DerivedCache():
+    '''Persists the tasks and projects read by TodoList.refresh, with the fields derived from them
+
+    Entries are keyed by the files mtime/size: the entities whose file did
+    not change are neither parsed nor scored again. The cache is only valid
+    on the day it was written: urgency and scheduled tasks depend on today's
+    date.
+    '''
+
+    VERSION = 3
+    FILENAME = '.cache.json'
+
+    def __init__(self, path):
+        self.path = os.path.join(path, DerivedCache.FILENAME)
+        self.data = None
+        self.changed = None     # names of the tasks read again, None if no derived field is reused
+
+
+    def __str__(self):
+        return f'<DerivedCache {self.path}>'
+
+
+    def __repr__(self):
+        return f'<DerivedCache {self.path}>'
+
+
+    def load(self):
+        data = filesIO.read(self.path, loads=True, fail_silently=True)
+        if not isinstance(data, dict) or data.get('version') != DerivedCache.VERSION: return None
+        if data['today'] != now(): return None
+        return data
+
+
+    def infos(self, storage, fingerprints):
+        '''{kind: {name: info}} of every task and project, read from the storage only if its file changed'''
+
+        self.data = self.load()
+        self.changed = None
+        infos = self._reuse(storage, fingerprints) if self.data is not None else None
+        return infos if infos is not None else storage.load_everything()
+
+
+    def _reuse(self, storage, fingerprints):
+        files, cached = self.data['files'], self.data['infos']
+        changed = {kind: [name for name, stamp in fingerprints[kind].items() if files[kind].get(name) != stamp] for kind in KINDS}
+        if any(files[kind].keys() - fingerprints[kind].keys() for kind in KINDS): return None     # removed entities
+        if sum(map(len, changed.values())) > sum(map(len, fingerprints.values()))//2: return None
+
+        infos = {}
+        for kind in KINDS:
+            if not changed[kind]: infos[kind] = cached[kind]; continue
+            infos[kind] = {name: cached[kind][name] if files[kind].get(name) == stamp else storage.read(kind, name)
+                for name, stamp in fingerprints[kind].items()}
+            if None in infos[kind].values(): return None     # not an entity (e.g. a database)
+
+        # A changed project may change the derived fields of any task
+        if not changed[PROJECT]: self.changed = set(changed[TASK])
+        return infos
+
+
+    def apply(self, todolist):
+        '''Copies the cached fields into the todolist entities
+
+        Returns the tasks to propagate again and the names of the projects to
+        score again, or None if everything is stale.
+        '''
+
+        changed, data = self.changed, self.data
+        if changed is None: return None
+
+        derived = data['tasks']
+        for t in todolist.tasks:
+            if t.name in changed: continue
+            d = derived[t.name]
+            t.projects, t.following = list(d['projects']), list(d['following'])
+            t.due, t.urgency, t.importance = d['due'], d['urgency'], d['importance']
+            t.shares = dict(d['shares'])
+
+        for p in todolist.projects: p.urgency = data['urgency'][p.name]
+
+        if not changed: return [], set()
+
+        # Dependency chains touching a changed task, in both directions, and
+        # the tasks that followed it before the change
+        followed = {t.name for t in todolist.tasks if not changed.isdisjoint(t.following)}
+        region = connected(todolist.tasks, changed | followed)
+
+        # Projects whose membership may change, old and new
+        affected = set()
+        for t in todolist.tasks:
+            if t.name in region:
+                affected.update(derived.get(t.name, {}).get('projects', []))
+                affected.add(t.project)
+
+        region_tasks = [t for t in todolist.tasks if t.name in region]
+        for t in region_tasks: t.projects, t.following = [t.project] if t.project else [], []
+
+        return region_tasks, affected
+
+
+    def save(self, todolist, fingerprints, infos):
+        '''Writes the entities and their derived fields, unless they all came from the cache'''
+
+        if self.changed is not None and not self.changed: return
+
+        data = {
+            'version': DerivedCache.VERSION,
+            'today': now(),
+            'files': fingerprints,
+            'infos': infos,
+            'urgency': {p.name: p.urgency for p in todolist.projects},
+            'tasks': {t.name: {
+                'projects': t.projects,
+                'following': t.following,
+                'due': t.due,
+                'urgency': t.urgency,
+                'importance': t.importance,
+                'shares': t.shares
+            } for t in todolist.tasks}
+        }
+
+        if not os.path.exists(self.path): git_ignore(os.path.dirname(self.path), DerivedCache.FILENAME)
+        filesIO.write(self.path, data, dumps=True)
+        self.data = data
@@ -0,0 +1,75 @@
+import os, sys, json, socket
+
+SOCKET = '.todo.sock'
+
+# Commands that always run in the calling shell: they read or write files
+# relative to it, and gain nothing from a todo list kept in memory
+LOCAL = ['serve', 'import', 'export']
+
+# Options, and the variable of tracing.py, that set the logger and the
+# printer for the whole process: the daemon would keep them for later commands
+LOCAL_OPTIONS = ['--logging-info', '--logging-debug', '--logging-io', '--indent']
+TRACE_ENV = 'TODO_TRACE'
+
+# Environment variables the daemon runs each command with
+FORWARDED_ENV = ['TODO_TODAY']
+
+
+def todolist_path():
+    return os.path.join(os.path.expanduser('~'), '.todolist', os.getenv('MY_STATUS'))
+
+
+def socket_path(path):
+    return os.path.join(path, SOCKET)
+
+
+def connect(path):
+    '''A connection to the daemon serving the todo list, or None if it is not running'''
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path(path))
+    except OSError:
+        sock.close()
+        return None
+    return sock
+
+
+def send(sock, message):
+    sock.sendall(json.dumps(message).encode() + b'\n')
+
+
+def receive(sock):
+    with sock.makefile('rb') as f:
+        line = f.readline()
+    return json.loads(line) if line else None
+
+
+def forward(args):
+    '''Runs the command in the daemon: its reply, or None if the command must run here'''
+
+    if any(a in LOCAL + LOCAL_OPTIONS for a in args) or os.getenv(TRACE_ENV): return None
+
+    sock = connect(todolist_path())
+    if sock is None: return None
+
+    with sock:
+        send(sock, {'args': args, 'env': {k: os.getenv(k) for k in FORWARDED_ENV}})
+        reply = receive(sock)
+
+    if reply is None or reply.get('local'): return None
+    return reply
+
+
+def main():
+    '''Entry point: forwards the command to `todo serve` if it is running'''
+
+    reply = forward(sys.argv[1:])
+    if reply is not None:
+        sys.stdout.write(reply['output'])
+        sys.stdout.flush()
+        sys.exit(reply['exit_code'])
+
+    # No daemon: import the whole CLI and run the command in this process
+    from todo import cli
+    cli()
@@ -0,0 +1,92 @@
+import os
+from bisect import bisect_left, bisect_right
+from .utilities import filesIO, git_ignore
+from .storage import TASK
+from .task_table import to_ordinal
+
+
+class CompletionIndex():
+    '''Completed tasks sorted by completion day, for date range queries
+
+    Stored in .completed.json with the fingerprint of the task files it was
+    built from: loading it reads again only the tasks whose file changed.
+    '''
+
+    VERSION = 1
+    FILENAME = '.completed.json'
+
+    def __init__(self, path):
+        self.path = os.path.join(path, CompletionIndex.FILENAME)
+        self.loaded = False
+        self.days = []          # sorted completion days (ordinals)
+        self.names = []         # the task completed on each day
+        self.completed = {}     # task name: completion day
+
+
+    def __str__(self):
+        return f'<CompletionIndex {self.path}>'
+
+
+    def __repr__(self):
+        return f'<CompletionIndex {self.path}>'
+
+
+    def load(self, storage):
+        data = filesIO.read(self.path, loads=True, fail_silently=True)
+        if not isinstance(data, dict) or data.get('version') != CompletionIndex.VERSION: data = None
+
+        files = data['files'] if data else {}
+        completed = data['completed'] if data else {}
+        fingerprint = storage.fingerprint(TASK)
+
+        changed = [name for name, stamp in fingerprint.items() if files.get(name) != stamp]
+        removed = files.keys() - fingerprint.keys()
+
+        infos = None
+        if len(changed) <= len(fingerprint)//2: infos = {name: storage.read(TASK, name) for name in changed}
+        if infos is None or None in infos.values():     # too many changes, or not a task (e.g. a database)
+            infos, completed = storage.load_all(TASK), {}
+
+        for name in removed: completed.pop(name, None)
+        for name, info in infos.items():
+            day = to_ordinal(info['completed'])
+            if day: completed[name] = day
+            else: completed.pop(name, None)
+
+        self.completed = completed
+        entries = sorted((day, name) for name, day in completed.items())
+        self.days = [day for day, _ in entries]
+        self.names = [name for _, name in entries]
+        self.loaded = True
+
+        if changed or removed or data is None:
+            if not os.path.exists(self.path): git_ignore(os.path.dirname(self.path), CompletionIndex.FILENAME)
+            filesIO.write(self.path, {
+                'version': CompletionIndex.VERSION,
+                'files': fingerprint,
+                'completed': completed
+            }, dumps=True)
+
+
+    def update(self, name, day):
+        '''Records the completion day of a task, 0 if it is not completed'''
+
+        if not self.loaded or self.completed.get(name, 0) == day: return
+
+        old = self.completed.pop(name, None)
+        if old:
+            start = bisect_left(self.days, old)
+            i = start + self.names[start:bisect_right(self.days, old)].index(name)
+            del self.days[i], self.names[i]
+
+        if day:
+            self.completed[name] = day
+            i = bisect_right(self.days, day)
+            self.days.insert(i, day)
+            self.names.insert(i, name)
+
+
+    def between(self, first, last):
+        '''Names of the tasks completed between the two days (ordinals), both included'''
+
+        return self.names[bisect_left(self.days, first):bisect_right(self.days, last)]
@@ -0,0 +1,124 @@
+import io, os, json, signal, socketserver
+from datetime import date
+from click.testing import CliRunner
+from . import utilities
+from .utilities import fatal_error
+from .storage import open_storage
+from .watcher import Watcher
+from .client import connect, send, socket_path
+
+
+class NeedsTerminal(Exception):
+    '''The command asked for the editor or an answer: it must run in the caller's terminal'''
+
+
+def no_terminal(*args, **kwargs):
+    raise NeedsTerminal()
+
+
+class NoInput(io.RawIOBase):
+    '''Standard input of the commands: a prompt (e.g. "Are you sure?") needs the terminal'''
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if len(buffer) == 0: return 0
+        raise NeedsTerminal()
+
+
+def interrupt(signum, frame):
+    raise KeyboardInterrupt()
+
+
+class Handler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        line = self.rfile.readline()
+        if not line: return
+        request = json.loads(line)
+        send(self.connection, self.server.run(request['args'], request.get('env') or {}))
+
+
+class TodoServer(socketserver.UnixStreamServer):
+    '''Answers the commands of `todo` clients, one at a time, with the todo list kept in memory
+
+    Before each command, the tasks and projects changed on disk by someone
+    else (a pull, another shell, an editor) are read again. The in-memory
+    todo list is dropped when a command fails (its changes were not written),
+    when the day changes and when the storage backend changes.
+    '''
+
+    def __init__(self, path, cli, todolist, reset):
+        self.path = path
+        self.cli = cli
+        self.todolist = todolist
+        self.reset = reset
+        self.watcher = None
+        self.day = None
+        self.runner = CliRunner()
+        super().__init__(socket_path(path), Handler)
+
+
+    def __str__(self):
+        return f'<TodoServer {self.path}>'
+
+
+    def __repr__(self):
+        return f'<TodoServer {self.path}>'
+
+
+    def drop(self):
+        '''Forgets the todo list: the next command reads it again'''
+
+        self.reset()
+        if self.watcher is not None: self.watcher.close()
+        self.watcher = Watcher(open_storage(self.path))
+        self.day = date.today()
+
+
+    def update(self):
+        if self.day != date.today() or type(self.watcher.storage) is not type(open_storage(self.path)):
+            return self.drop()
+
+        try: self.todolist().reload(self.watcher.changes())
+        except (Exception, SystemExit): self.drop()     # the next command reports the error
+
+
+    def run(self, args, env):
+        if self.watcher is None: self.drop()
+        else: self.update()
+
+        result = self.runner.invoke(self.cli, args, input=NoInput(), env=env)
+
+        if isinstance(result.exception, NeedsTerminal):
+            self.drop()
+            return {'local': True}
+
+        if result.exit_code != 0: self.drop()
+        return {'exit_code': result.exit_code, 'output': result.output}
+
+
+def serve(path, cli, todolist, reset):
+    '''Serves the todo list at path on its socket until interrupted'''
+
+    sock = connect(path)
+    if sock is not None:
+        sock.close()
+        fatal_error(f'a todo daemon is already serving {path}')
+
+    # Left by a daemon that did not exit cleanly
+    if os.path.exists(socket_path(path)): os.remove(socket_path(path))
+
+    # The editor cannot be opened from the daemon
+    utilities.editor_input = no_terminal
+    signal.signal(signal.SIGTERM, interrupt)
+
+    server = TodoServer(path, cli, todolist, reset)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        os.remove(socket_path(path))
@@ -0,0 +1,93 @@
+import os, subprocess
+from contextlib import contextmanager
+from .utilities import fatal_error
+
+
+class BatchedGit():
+    '''GitWrapper that can collect the commits of a whole command into a single one'''
+
+    def __init__(self, path):
+        self.path = path
+        self._git = None
+        self._paths = None
+        self._messages = None
+
+
+    def __str__(self):
+        return f'<BatchedGit {self.path}>'
+
+
+    def __repr__(self):
+        return f'<BatchedGit {self.path}>'
+
+
+    @property
+    def git(self):
+        # GitPython is slow to import: open the repository on first use
+        if self._git is None:
+            from biumsputils.git_wrapper import GitWrapper
+            self._git = GitWrapper(self.path)
+        return self._git
+
+
+    @contextmanager
+    def batch(self):
+        '''Every commit inside the block becomes part of one commit, made on exit'''
+
+        if self._paths is not None:
+            yield; return
+
+        self._paths, self._messages = [], []
+        try:
+            yield
+        finally:
+            paths, messages = self._paths, self._messages
+            self._paths = self._messages = None
+            if paths: self.commit(paths, self._combine(messages))
+
+
+    def _combine(self, messages):
+        if len(messages) == 1: return messages[0]
+        return f'{messages[0]} (and {len(messages) - 1} more)\n\n' + '\n'.join(messages)
+
+
+    def commit(self, paths, message):
+        if isinstance(paths, str): paths = [paths]
+
+        if self._paths is not None:
+            self._paths += [p for p in paths if p not in self._paths]
+            if message not in self._messages: self._messages.append(message)
+            return
+
+        if len(paths) == 1: self.git.commit(paths[0], message)
+        else: self._commit_many(paths, message)
+
+
+    def _commit_many(self, paths, message):
+        '''Stages the paths, removed ones included, then commits them at once
+
+        GitWrapper commits a single path: several are staged with git itself,
+        the list given on stdin (it can hold every file of the todo list).
+        '''
+
+        def git(*args, paths=()):
+            result = subprocess.run(['git', '-C', self.path] + list(args), input='\0'.join(paths), text=True, capture_output=True)
+            if result.returncode != 0 and args[0] != 'diff': fatal_error(f'git {args[0]} failed: {result.stderr.strip()}')
+            return result
+
+        present = [p for p in paths if os.path.exists(p)]
+        removed = [p for p in paths if not os.path.exists(p)]
+        if present: git('add', '--pathspec-from-file=-', '--pathspec-file-nul', paths=present)
+        if removed: git('rm', '-r', '-q', '--cached', '--ignore-unmatch', '--pathspec-from-file=-', '--pathspec-file-nul', paths=removed)
+
+        # Nothing staged: the files were already committed as they are
+        if git('diff', '--cached', '--quiet').returncode == 0: return
+        git('commit', '-q', '-m', message)
+
+
+    def push(self):
+        self.git.push()
+
+
+    def pull(self):
+        self.git.pull()
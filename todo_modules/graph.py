@@ -0,0 +1,157 @@
+class DependencyGraph():
+    '''Followers graph between a set of tasks
+
+    An edge goes from a task to each of its followers, i.e. to the tasks that
+    can only start after it. Followers outside the set are ignored.
+    '''
+
+    def __init__(self, tasks):
+        self.tasks = {t.name: t for t in tasks}
+        self.followers = {name: [] for name in self.tasks}
+        self.following = {name: [] for name in self.tasks}
+
+        for t in self.tasks.values():
+            for name in dict.fromkeys(t.followers):
+                if name not in self.tasks: continue
+                self.followers[t.name].append(name)
+                self.following[name].append(t.name)
+
+
+    def __str__(self):
+        return f'<DependencyGraph {len(self.tasks)} tasks>'
+
+
+    def __repr__(self):
+        return f'<DependencyGraph {len(self.tasks)} tasks>'
+
+
+    def components(self):
+        '''Strongly connected components, followers before the tasks they follow (Tarjan)'''
+
+        index, low = {}, {}
+        stack, on_stack = [], set()
+        components = []
+
+        for root in self.followers:
+            if root in index: continue
+
+            index[root] = low[root] = len(index)
+            stack.append(root); on_stack.add(root)
+            work = [(root, iter(self.followers[root]))]
+
+            while work:
+                node, children = work[-1]
+
+                for child in children:
+                    if child not in index:
+                        index[child] = low[child] = len(index)
+                        stack.append(child); on_stack.add(child)
+                        work.append((child, iter(self.followers[child])))
+                        break
+                    if child in on_stack: low[node] = min(low[node], index[child])
+
+                else:
+                    work.pop()
+                    if work: low[work[-1][0]] = min(low[work[-1][0]], low[node])
+                    if low[node] != index[node]: continue
+
+                    component = []
+                    while True:
+                        name = stack.pop()
+                        on_stack.discard(name)
+                        component.append(name)
+                        if name == node: break
+                    components.append(component)
+
+        return components
+
+
+    def cycles(self):
+        '''Components that form a dependency cycle'''
+
+        return [sorted(c) for c in self.components() if len(c) > 1 or c[0] in self.followers[c[0]]]
+
+
+    def reachable(self, name):
+        '''Names of the tasks that (transitively) follow the given one, itself included'''
+
+        visited, stack = {name}, [name]
+        while stack:
+            for follower in self.followers[stack.pop()]:
+                if follower in visited: continue
+                visited.add(follower)
+                stack.append(follower)
+
+        return visited
+
+
+    def reachable_counts(self):
+        '''Number of tasks reachable from each task, itself included, in one pass
+
+        Each component gets a bitset over a dense task index, built from the
+        bitsets of its followers' components, which are computed first.
+        '''
+
+        component_of, reach, counts = {}, [], {}
+        position = 0
+
+        for c, component in enumerate(self.components()):
+            for name in component: component_of[name] = c
+
+            name = component[0]
+            if len(component) == 1 and not self.followers[name] and not self.following[name]:
+                counts[name] = 1
+                reach.append(0)
+                continue
+
+            bits = 0
+            for name in component:
+                bits |= 1 << position
+                position += 1
+                for follower in self.followers[name]:
+                    if component_of[follower] != c: bits |= reach[component_of[follower]]
+
+            reach.append(bits)
+            count = bin(bits).count('1')
+            for name in component: counts[name] = count
+
+        return counts
+
+
+def connected(tasks, names):
+    '''Names of the tasks linked to the given ones by a chain of dependencies, in either direction'''
+
+    neighbours = {t.name: set(t.followers) for t in tasks}
+    for t in tasks:
+        for name in t.followers: neighbours.setdefault(name, set()).add(t.name)
+
+    region, stack = set(), list(names)
+    while stack:
+        name = stack.pop()
+        if name in region: continue
+        region.add(name)
+        stack.extend(neighbours.get(name, ()))
+
+    return region
+
+
+def find_path(start, targets, followers):
+    '''Returns a followers path from start to one of the targets, or None
+
+    followers(name) returns the names of the followers of a task.
+    '''
+
+    parents, stack = {start: None}, [start]
+    while stack:
+        name = stack.pop()
+        for follower in followers(name):
+            if follower in targets:
+                path = [follower, name]
+                while parents[path[-1]] is not None: path.append(parents[path[-1]])
+                return path[::-1]
+
+            if follower in parents: continue
+            parents[follower] = name
+            stack.append(follower)
+
+    return None
@@ -0,0 +1,38 @@
+from .project import Project
+
+
+class ProjectHierarchy():
+    '''Parent -> milestones index of the projects, with depth and status
+
+    Project status comes from the Membership index. Projects whose parent
+    does not exist are roots; projects on a parent cycle are not reachable
+    from any root and keep depth None.
+    '''
+
+    def __init__(self, projects, membership):
+        self.projects = {p.name: p for p in projects}
+        self.children = {name: [] for name in self.projects}
+        self.roots = []
+
+        for p in projects:
+            if p.parent in self.children and p.parent != p.name: self.children[p.parent].append(p)
+            else: self.roots.append(p)
+
+        self.depth = {}
+        level, depth = self.roots, 0
+        while level:
+            for p in level:
+                self.depth[p.name] = p.level = depth
+            level = [c for p in level for c in self.children[p.name]]
+            depth += 1
+
+        for p in projects:
+            p.status = Project.ACTIVE if membership.is_active(p.name) else Project.COMPLETED
+
+
+    def __str__(self):
+        return f'<ProjectHierarchy {len(self.projects)} projects>'
+
+
+    def __repr__(self):
+        return f'<ProjectHierarchy {len(self.projects)} projects>'
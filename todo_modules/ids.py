@@ -0,0 +1,67 @@
+import os, json
+from contextlib import contextmanager
+from .utilities import num2str, git_ignore
+from .storage import TASK, KINDS
+
+try: import fcntl
+except ImportError: fcntl = None      # no locking on Windows
+
+
+class IdCounter():
+    '''Next task and project numbers, persisted in .ids.json
+
+    Allocating reads and rewrites that small file under an exclusive lock,
+    without listing the todo list. The counter is rebuilt from the names in
+    the storage when the file is missing or unreadable, and when it is behind
+    the storage (e.g. after a pull): numbers are never given twice, archived
+    tasks included.
+    '''
+
+    VERSION = 1
+    FILENAME = '.ids.json'
+
+    def __init__(self, path, archive=None):
+        self.path = os.path.join(path, IdCounter.FILENAME)
+        self.archive = archive
+
+
+    def __str__(self):
+        return f'<IdCounter {self.path}>'
+
+
+    def __repr__(self):
+        return f'<IdCounter {self.path}>'
+
+
+    @contextmanager
+    def _locked(self):
+        if not os.path.exists(self.path): git_ignore(os.path.dirname(self.path), IdCounter.FILENAME)
+        with open(self.path, 'a+') as f:
+            if fcntl: fcntl.flock(f, fcntl.LOCK_EX)
+            f.seek(0)
+            yield f
+
+
+    def allocate(self, storage, kind, count=1):
+        '''Reserves count consecutive numbers for new entities of a kind, returns the first'''
+
+        with self._locked() as f:
+            try: data = json.loads(f.read())
+            except ValueError: data = None
+            if not isinstance(data, dict) or data.get('version') != IdCounter.VERSION: data = None
+
+            if data is None or storage.exists(kind, num2str(data[kind])):
+                scanned = {k: max(map(int, storage.names(k)), default=-1) + 1 for k in KINDS}
+                data = {k: max(scanned[k], data[k] if data else 0) for k in KINDS}
+                data['version'] = IdCounter.VERSION
+
+            # Tasks archived since (e.g. by another clone, then pulled) keep their numbers
+            if self.archive is not None: data[TASK] = max(data[TASK], self.archive.index['next'])
+            first = data[kind]
+            data[kind] += count
+
+            f.seek(0)
+            f.truncate()
+            f.write(json.dumps(data))
+
+        return first
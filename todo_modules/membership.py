@@ -0,0 +1,81 @@
+import math
+from . import task_table
+from .task_table import today
+
+ACTIVE, SCHEDULED, COMPLETED, DELETED = 'active', 'scheduled', 'completed', 'deleted'
+STATES = [ACTIVE, SCHEDULED, COMPLETED, DELETED]
+
+
+def task_state(task):
+    status = task.table.status[task.row]
+    if status == task_table.DONE: return COMPLETED
+    if status == task_table.DEL: return DELETED
+    return SCHEDULED if task.table.created[task.row] > today() else ACTIVE
+
+
+class Membership():
+    '''Project -> tasks inverted index, by task state, with the hours of each project
+
+    Hours are summed with math.fsum: they do not depend on the order tasks
+    were added or updated in. The tasks in the archive, if given, are counted
+    by project there.
+    '''
+
+    def __init__(self, tasks, archive=None):
+        self.archive = archive
+        self.members = {}       # project name: {state: set of task names}
+        self.indexed = {}       # task name: (state, projects, time) as indexed
+        self._hours = {}        # (project name, state): hours
+
+        for t in tasks: self.update(t)
+
+
+    def __str__(self):
+        return f'<Membership {len(self.members)} projects>'
+
+
+    def __repr__(self):
+        return f'<Membership {len(self.members)} projects>'
+
+
+    def update(self, task):
+        '''Indexes a task again, after it changed'''
+
+        entry = (task_state(task), tuple(task.projects), task.time)
+        old = self.indexed.get(task.name)
+        if old == entry: return
+
+        if old is not None:
+            state, projects, _ = old
+            for name in projects:
+                self.members[name][state].discard(task.name)
+                self._hours.pop((name, state), None)
+
+        state, projects, _ = self.indexed[task.name] = entry
+        for name in projects:
+            if name not in self.members: self.members[name] = {s: set() for s in STATES}
+            self.members[name][state].add(task.name)
+            self._hours.pop((name, state), None)
+
+
+    def tasks(self, project_name, state=ACTIVE):
+        '''Names of the tasks of a project in the given state'''
+
+        members = self.members.get(project_name)
+        return members[state] if members else set()
+
+
+    def hours(self, project_name, state=ACTIVE):
+        key = (project_name, state)
+        if key not in self._hours:
+            self._hours[key] = math.fsum(self.indexed[name][2] for name in self.tasks(project_name, state))
+        return self._hours[key]
+
+
+    def is_active(self, project_name):
+        '''Projects with active tasks are active, and so are projects with no tasks at all'''
+
+        members = self.members.get(project_name)
+        if not members or not any(members.values()):
+            return self.archive is None or not self.archive.has_tasks(project_name)
+        return bool(members[ACTIVE])
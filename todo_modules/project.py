@@ -1,6 +1,5 @@
-import os
-from .utilities import filesIO, now, never
-from .utilities import decorate_class, debugger, logger
+from .utilities import now, never, fatal_error
+from .storage import PROJECT
 
 
 class Project():
@@ -10,16 +9,20 @@ class Project():
 
     todolist = None
     
-    def __init__(self, name):
+    def __init__(self, name, info=None, create=False):
         self.name = name
         self.iname = int(name)
         self.status = Project.ACTIVE
-        self.path = os.path.join(Project.todolist.path, name + '.project')
-        self.info = self.read()
+        self.path = Project.todolist.storage.entity_path(PROJECT, name)
+        self.dirty = False
         self.urgency = 0
         self.level = 0
 
-        self.write() 
+        if create:
+            self.info = self._newborn_info()
+            self.write()
+        else: 
+            self.info = info if info is not None else self.read()
 
 
     def _newborn_info(self):
@@ -28,7 +31,8 @@ class Project():
             'importance': 100,
             'due': never(),
             'created': now(),
-            'parent': ''
+            'parent': '',
+            'reference': ''
         }
 
 
@@ -41,15 +45,14 @@ class Project():
 
 
     def read(self):
-        if os.path.isfile(self.path):
-            info = filesIO.read(self.path, loads=True)
-        else:
-            info = self._newborn_info()
+        info = Project.todolist.storage.read(PROJECT, self.name)
+        if info is None: fatal_error(f'no project numbered "{self.name}"')
         return info
 
 
     def write(self):
-        filesIO.write(self.path, self.info, dumps=True)
+        self.dirty = True
+        Project.todolist.write(PROJECT, self)
         
 
     @property
@@ -144,5 +147,3 @@ class Project():
     def is_completed(self):
         return self.status == Project.COMPLETED
 
-
-Project = decorate_class(Project, debugger(logger, 'Project'))
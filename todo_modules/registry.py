@@ -0,0 +1,27 @@
+class Registry(list):
+    '''List of tasks or projects, indexed by integer id and by name'''
+
+    def __init__(self, entities=()):
+        super().__init__(entities)
+        self._by_id = {e.iname: e for e in self}
+        self._by_name = {e.name: e for e in self}
+
+
+    def append(self, entity):
+        super().append(entity)
+        self._by_id[entity.iname] = entity
+        self._by_name[entity.name] = entity
+
+
+    def remove(self, entity):
+        super().remove(entity)
+        del self._by_id[entity.iname]
+        del self._by_name[entity.name]
+
+
+    def by_id(self, iname):
+        return self._by_id.get(iname)
+
+
+    def by_name(self, name):
+        return self._by_name.get(name)
@@ -0,0 +1,111 @@
+'''Urgency of the projects, due date and urgency of their tasks
+
+Two paths giving the same results: a pure-Python one, and a vectorized one
+over the TaskTable columns, used when NumPy is installed and the todo list is
+large enough to pay for importing it.
+'''
+import os, math
+from .utilities import never, fatal_error
+from .task_table import NEVER, to_ordinal, today
+
+WORKING_HOURS_PER_DAY = 4
+NUMPY_MIN_TASKS = 20000     # below this, importing numpy costs more than it saves
+NUMPY_ENV = 'TODO_NUMPY'    # set to 0 to always use the pure-Python path
+
+_numpy = None
+
+
+def numpy():
+    '''The numpy module, or None if it is not installed or disabled'''
+
+    global _numpy
+    if _numpy is None:
+        _numpy = False
+        if os.environ.get(NUMPY_ENV) != '0':
+            try:
+                import numpy
+                _numpy = numpy
+            except ImportError: pass
+
+    return _numpy or None
+
+
+def project_urgency(hours, days_left):
+    '''100 if the project takes all the time left before its due date, less otherwise'''
+
+    time = max(hours, 1)                                # estimated completion time
+    time_left = days_left*WORKING_HOURS_PER_DAY         # hours
+
+    # How many times could you complete the project in the time left
+    confidence = time_left/time
+
+    return math.floor(100//max([confidence, 1]))
+
+
+def project(all_projects, name):
+    '''The project a task names, which may have been removed or edited by hand'''
+
+    p = all_projects.by_name(name)
+    if p is None: fatal_error(f'no project numbered "{name}"')
+    return p
+
+
+def score(projects, tasks, all_projects, table, membership):
+    '''Sets the urgency of the projects, then due date and urgency of the tasks
+
+    The hours of a project are those of its active tasks, from the
+    membership index. all_projects resolves the projects of the tasks.
+    '''
+
+    np = numpy() if len(tasks) >= NUMPY_MIN_TASKS else None
+    if np is None: score_python(projects, tasks, all_projects, membership)
+    else: score_numpy(np, projects, tasks, all_projects, table, membership)
+
+
+def score_python(projects, tasks, all_projects, membership):
+    day = today()
+
+    for p in projects:
+        p.urgency = project_urgency(membership.hours(p.name), to_ordinal(p.due) - day)
+
+    for t in tasks:
+        task_projects = [project(all_projects, name) for name in t.projects]
+        t.due = min((p.due for p in task_projects), default=never())
+        t.urgency = max((p.urgency for p in task_projects), default=0)
+
+
+def score_numpy(np, projects, tasks, all_projects, table, membership):
+    day = today()
+
+    index = {p.name: i for i, p in enumerate(all_projects)}
+    for t in tasks:
+        for name in t.projects:
+            if name not in index: project(all_projects, name)
+    due = np.array([to_ordinal(p.due) for p in all_projects], dtype=np.int64)
+    urgency = np.array([p.urgency for p in all_projects], dtype=np.int64)
+
+    # Task x project membership, CSR: the projects of task i are indices[indptr[i]:indptr[i+1]]
+    rows = np.fromiter((t.row for t in tasks), dtype=np.int64, count=len(tasks))
+    counts = np.fromiter((len(table.projects[r]) for r in rows.tolist()), dtype=np.int64, count=len(tasks))
+    indices = np.fromiter((index[name] for r in rows.tolist() for name in table.projects[r]), dtype=np.int64)
+    indptr = np.zeros(len(tasks) + 1, dtype=np.int64)
+    np.cumsum(counts, out=indptr[1:])
+
+    scored = np.array([index[p.name] for p in projects], dtype=np.int64)
+    hours = np.array([membership.hours(p.name) for p in projects], dtype=np.float64)
+    time_needed = np.maximum(hours, 1)
+    confidence = (due[scored] - day)*WORKING_HOURS_PER_DAY/time_needed
+    urgency[scored] = np.floor_divide(100, np.maximum(confidence, 1))
+    for p, u in zip(projects, urgency[scored].tolist()): p.urgency = u
+
+    # Closest due date and highest urgency over the projects of each task
+    task_due = np.full(len(tasks), NEVER, dtype=np.int64)
+    task_urgency = np.zeros(len(tasks), dtype=np.int64)
+    starts = indptr[:-1][counts > 0]
+    if len(starts):
+        task_due[counts > 0] = np.minimum.reduceat(due[indices], starts)
+        task_urgency[counts > 0] = np.maximum.reduceat(urgency[indices], starts)
+
+    for r, d, u in zip(rows.tolist(), task_due.tolist(), task_urgency.tolist()):
+        table.due[r] = d
+        table.urgency[r] = u
@@ -0,0 +1,193 @@
+import os, re, zlib, sqlite3
+try: from re import _parser as sre_parse    # Python 3.11+
+except ImportError: import sre_parse
+from .utilities import fatal_error, git_ignore
+from .storage import PROJECT
+
+SUBSTRING, WORD, REGEX = 'substring', 'word', 'regex'
+MATCHES = [SUBSTRING, WORD, REGEX]
+
+
+def text(kind, entity):
+    '''The searchable text of a task or project'''
+
+    if kind == PROJECT: return entity.description + '\n' + entity.reference
+    return entity.description
+
+
+def checksum(text):
+    return zlib.crc32(text.encode())
+
+
+def regex_literals(pattern):
+    '''Literal runs that every match of the pattern contains, possibly none
+
+    Read from the parsed pattern: groups are only entered when they are
+    required, and lookarounds, alternatives and classes end a run.
+    '''
+
+    try: parsed = sre_parse.parse(pattern)
+    except (re.error, RecursionError): return []
+
+    repeats = {sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT, getattr(sre_parse, 'POSSESSIVE_REPEAT', None)}
+    runs = []
+
+    def walk(items):
+        run = ''
+        for op, av in items:
+            if op is sre_parse.LITERAL: run += chr(av); continue
+            runs.append(run); run = ''
+            if op is sre_parse.SUBPATTERN: walk(av[-1])
+            elif op in repeats and av[0] >= 1: walk(av[2])
+            elif op is getattr(sre_parse, 'ATOMIC_GROUP', None): walk(av)
+        runs.append(run)
+
+    walk(parsed)
+    return [r for r in runs if len(r) >= 3]
+
+
+def matcher(query, match=SUBSTRING, ignore_case=False):
+    '''Returns a predicate telling whether a text matches the query'''
+
+    if match == SUBSTRING and not ignore_case: return lambda text: query in text
+    if match == SUBSTRING:
+        query = query.lower()
+        return lambda text: query in text.lower()
+
+    pattern = query if match == REGEX else r'\b' + re.escape(query) + r'\b'
+    try: pattern = re.compile(pattern, re.IGNORECASE if ignore_case else 0)
+    except re.error as e: fatal_error(f'invalid regular expression "{query}": {e}')
+    return lambda text: pattern.search(text) is not None
+
+
+class SearchIndex():
+    '''Trigram inverted index over the descriptions of tasks and projects
+
+    Lives in a sqlite FTS5 table next to the todo list, created by the first
+    search. Writes made through the todo list update it incrementally; each
+    entity is stored with a checksum of the indexed text, so that the ones
+    edited elsewhere (e.g. by a git pull) are indexed again by the next search.
+    Without FTS5 trigram support (sqlite < 3.34) searches scan every text.
+    '''
+
+    VERSION = 1
+    FILENAME = '.search.sqlite'
+
+    def __init__(self, path):
+        self.path = os.path.join(path, SearchIndex.FILENAME)
+        self._db = None
+        self._touched = {}
+
+
+    def __str__(self):
+        return f'<SearchIndex {self.path}>'
+
+
+    def __repr__(self):
+        return f'<SearchIndex {self.path}>'
+
+
+    @property
+    def db(self):
+        '''The index database, or None if sqlite cannot build it'''
+
+        if self._db is None:
+            if not os.path.exists(self.path): git_ignore(os.path.dirname(self.path), SearchIndex.FILENAME)
+            db = sqlite3.connect(self.path)
+            if db.execute('PRAGMA user_version').fetchone()[0] != SearchIndex.VERSION:
+                db.close(); os.remove(self.path)
+                db = sqlite3.connect(self.path)
+
+            try:
+                db.executescript(f'''
+                    CREATE VIRTUAL TABLE IF NOT EXISTS texts USING fts5(text, tokenize='trigram');
+                    CREATE TABLE IF NOT EXISTS entities (kind TEXT, name TEXT, checksum INTEGER, text_id INTEGER,
+                        PRIMARY KEY (kind, name)) WITHOUT ROWID;
+                    CREATE TABLE IF NOT EXISTS kinds (kind TEXT PRIMARY KEY, checksum INTEGER);
+                    PRAGMA user_version = {SearchIndex.VERSION};
+                ''')
+                self._db = db
+            except sqlite3.OperationalError:
+                db.close()
+                os.remove(self.path)
+                self._db = False
+
+        return self._db or None
+
+
+    def touch(self, kind, entity):
+        '''Marks an entity as written: it is indexed again by the next flush'''
+        self._touched[(kind, entity.name)] = entity
+
+
+    def flush(self):
+        touched, self._touched = self._touched, {}
+        if not touched or not os.path.isfile(self.path) or self.db is None: return
+
+        with self.db:
+            for kind in {kind for kind, _ in touched}: self.db.execute('DELETE FROM kinds WHERE kind = ?', (kind,))
+            for (kind, name), entity in touched.items():
+                row = self.db.execute('SELECT checksum, text_id FROM entities WHERE kind = ? AND name = ?', (kind, name)).fetchone()
+                self._index(kind, name, text(kind, entity), row)
+
+
+    def _index(self, kind, name, text, row):
+        '''row: checksum and text id the entity is indexed with, if any'''
+
+        if row is not None:
+            if row[0] == checksum(text): return
+            self.db.execute('DELETE FROM texts WHERE rowid = ?', (row[1],))
+
+        text_id = self.db.execute('INSERT INTO texts VALUES (?)', (text,)).lastrowid
+        self.db.execute('INSERT OR REPLACE INTO entities VALUES (?, ?, ?, ?)', (kind, name, checksum(text), text_id))
+
+
+    def sync(self, kind, texts):
+        '''Brings the index of a kind up to date with {name: text}'''
+
+        # Nothing to compare if no text changed since the last sync
+        total = sum(checksum(name + '\0' + text) for name, text in texts.items())
+        row = self.db.execute('SELECT checksum FROM kinds WHERE kind = ?', (kind,)).fetchone()
+        if row is not None and row[0] == total: return
+
+        stored = {name: row for name, *row in self.db.execute(
+            'SELECT name, checksum, text_id FROM entities WHERE kind = ?', (kind,))}
+
+        with self.db:
+            for name in stored.keys() - texts.keys():
+                self.db.execute('DELETE FROM texts WHERE rowid = ?', (stored[name][1],))
+                self.db.execute('DELETE FROM entities WHERE kind = ? AND name = ?', (kind, name))
+
+            for name, text in texts.items():
+                row = stored.get(name)
+                if row is None or row[0] != checksum(text): self._index(kind, name, text, row)
+
+            self.db.execute('INSERT OR REPLACE INTO kinds VALUES (?, ?)', (kind, total))
+
+
+    def candidates(self, kind, query, match=SUBSTRING):
+        '''Names of the entities that may match the query, or None if the index cannot tell'''
+
+        literals = regex_literals(query) if match == REGEX else [query]
+        literals = [l for l in literals if len(l) >= 3]
+        if not literals: return None
+
+        expression = ' AND '.join('"' + l.replace('"', '""') + '"' for l in literals)
+        rows = self.db.execute(
+            'SELECT name FROM entities WHERE kind = ? AND text_id IN (SELECT rowid FROM texts WHERE texts MATCH ?)',
+            (kind, expression))
+        return {name for name, in rows}
+
+
+    def find(self, kind, texts, query, match=SUBSTRING, ignore_case=False):
+        '''Names in {name: text} whose text matches the query'''
+
+        matches = matcher(query, match, ignore_case)
+
+        candidates = None
+        if self.db is not None:
+            self.sync(kind, texts)
+            candidates = self.candidates(kind, query, match)
+        if candidates is None: candidates = texts
+
+        return {name for name in candidates if name in texts and matches(texts[name])}
@@ -0,0 +1,293 @@
+import os, json, sqlite3
+from .utilities import filesIO
+
+
+TASK = 'task'
+PROJECT = 'project'
+KINDS = (TASK, PROJECT)
+
+
+class JsonStorage():
+    '''One JSON file per entity: <path>/<name>.task and <path>/<name>.project'''
+
+    BACKEND = 'json'
+
+    def __init__(self, path):
+        self.path = path
+
+
+    def __str__(self):
+        return f'<JsonStorage {self.path}>'
+
+
+    def __repr__(self):
+        return f'<JsonStorage {self.path}>'
+
+
+    def entity_path(self, kind, name):
+        return os.path.join(self.path, f'{name}.{kind}')
+
+
+    def exists(self, kind, name):
+        return os.path.isfile(self.entity_path(kind, name))
+
+
+    def read(self, kind, name):
+        path = self.entity_path(kind, name)
+        if not os.path.isfile(path): return None
+        return filesIO.read(path, loads=True)
+
+
+    def write(self, kind, name, info):
+        # Write aside and rename, so a file is never left half written
+        path = self.entity_path(kind, name)
+        filesIO.write(path + '.tmp', info, dumps=True)
+        os.replace(path + '.tmp', path)
+
+
+    def write_many(self, entities):
+        for kind, name, info in entities: self.write(kind, name, info)
+
+
+    def remove_many(self, entities):
+        '''Removes the given (kind, name), the missing ones ignored'''
+        for kind, name in entities:
+            try: os.remove(self.entity_path(kind, name))
+            except FileNotFoundError: pass
+
+
+    def scan(self):
+        '''The os.DirEntry of every task and project file, by kind and name, in one directory pass'''
+
+        entries = {kind: {} for kind in KINDS}
+        with os.scandir(self.path) as it:
+            for entry in it: classify(entry, entries)
+        return entries
+
+
+    def names(self, kind):
+        return list(self.scan()[kind])
+
+
+    def load_all(self, kind):
+        return {name: filesIO.read(entry.path, loads=True) for name, entry in self.scan()[kind].items()}
+
+
+    def load_everything(self):
+        '''Returns {kind: {name: info}} for both kinds'''
+
+        return {kind: {name: filesIO.read(entry.path, loads=True) for name, entry in entries.items()}
+            for kind, entries in self.scan().items()}
+
+
+    def fingerprints(self):
+        '''Returns {kind: {name: [mtime, size]}} for both kinds'''
+
+        fingerprints = {}
+        for kind, entries in self.scan().items():
+            fingerprints[kind] = {}
+            for name, entry in entries.items():
+                stat = entry.stat()
+                fingerprints[kind][name] = [stat.st_mtime_ns, stat.st_size]
+        return fingerprints
+
+
+    def fingerprint(self, kind):
+        '''Returns {name: [mtime, size]} for every entity of the given kind'''
+        return self.fingerprints()[kind]
+
+
+    def remove_all(self):
+        for entries in self.scan().values():
+            for entry in entries.values(): os.remove(entry.path)
+
+
+class ShardedStorage(JsonStorage):
+    '''One JSON file per entity, in directories by id prefix: <path>/tasks/00/0012.task
+
+    The shard of an entity is its name without the last two digits: a shard
+    holds at most 100 entities, and no directory grows with the todo list.
+    '''
+
+    BACKEND = 'sharded'
+    DIRECTORIES = {TASK: 'tasks', PROJECT: 'projects'}
+
+    def __init__(self, path):
+        super().__init__(path)
+        self._shards = set()    # shard directories known to exist
+
+
+    def __str__(self):
+        return f'<ShardedStorage {self.path}>'
+
+
+    def __repr__(self):
+        return f'<ShardedStorage {self.path}>'
+
+
+    def entity_path(self, kind, name):
+        return os.path.join(self.path, ShardedStorage.DIRECTORIES[kind], name[:-2], f'{name}.{kind}')
+
+
+    def write(self, kind, name, info):
+        shard = os.path.dirname(self.entity_path(kind, name))
+        if shard not in self._shards:
+            os.makedirs(shard, exist_ok=True)
+            self._shards.add(shard)
+        super().write(kind, name, info)
+
+
+    def scan(self):
+        entries = {kind: {} for kind in KINDS}
+        for directory in ShardedStorage.DIRECTORIES.values():
+            directory = os.path.join(self.path, directory)
+            if not os.path.isdir(directory): continue
+
+            with os.scandir(directory) as shards:
+                for shard in shards:
+                    if not shard.is_dir(): continue
+                    with os.scandir(shard.path) as it:
+                        for entry in it: classify(entry, entries)
+        return entries
+
+
+    def remove_all(self):
+        super().remove_all()
+        self._shards.clear()
+
+        # Empty directories only: anything else in there is not ours
+        for directory in ShardedStorage.DIRECTORIES.values():
+            directory = os.path.join(self.path, directory)
+            if not os.path.isdir(directory): continue
+            for shard in os.listdir(directory):
+                try: os.rmdir(os.path.join(directory, shard))
+                except OSError: pass
+            try: os.rmdir(directory)
+            except OSError: pass
+
+
+def classify(entry, entries):
+    '''Adds a directory entry to {kind: {name: entry}} if it is a task or project file'''
+
+    name, _, kind = entry.name.rpartition('.')
+    if kind in entries: entries[kind][name] = entry
+
+
+class SqliteStorage():
+    '''All the entities in a single SQLite file: <path>/todo.sqlite'''
+
+    BACKEND = 'sqlite'
+    FILENAME = 'todo.sqlite'
+
+    def __init__(self, path):
+        self.path = path
+        self.db_path = os.path.join(path, SqliteStorage.FILENAME)
+        self._db = None
+
+
+    def __str__(self):
+        return f'<SqliteStorage {self.db_path}>'
+
+
+    def __repr__(self):
+        return f'<SqliteStorage {self.db_path}>'
+
+
+    @property
+    def db(self):
+        if self._db is None:
+            self._db = sqlite3.connect(self.db_path)
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS entities ('
+                'kind TEXT NOT NULL, name TEXT NOT NULL, info TEXT NOT NULL, '
+                'PRIMARY KEY (kind, name))'
+            )
+        return self._db
+
+
+    def entity_path(self, kind, name):
+        # Every entity lives in the database file, which is what git tracks
+        return self.db_path
+
+
+    def exists(self, kind, name):
+        row = self.db.execute('SELECT 1 FROM entities WHERE kind = ? AND name = ?', (kind, name)).fetchone()
+        return row is not None
+
+
+    def read(self, kind, name):
+        row = self.db.execute('SELECT info FROM entities WHERE kind = ? AND name = ?', (kind, name)).fetchone()
+        if row is None: return None
+        return json.loads(row[0])
+
+
+    def write(self, kind, name, info):
+        self.write_many([(kind, name, info)])
+
+
+    def write_many(self, entities):
+        with self.db:
+            self.db.executemany('INSERT OR REPLACE INTO entities (kind, name, info) VALUES (?, ?, ?)',
+                [(kind, name, json.dumps(info)) for kind, name, info in entities])
+
+
+    def remove_many(self, entities):
+        with self.db:
+            self.db.executemany('DELETE FROM entities WHERE kind = ? AND name = ?', list(entities))
+
+
+    def names(self, kind):
+        return [row[0] for row in self.db.execute('SELECT name FROM entities WHERE kind = ?', (kind,))]
+
+
+    def load_all(self, kind):
+        rows = self.db.execute('SELECT name, info FROM entities WHERE kind = ?', (kind,))
+        return {name: json.loads(info) for name, info in rows}
+
+
+    def load_everything(self):
+        return {kind: self.load_all(kind) for kind in KINDS}
+
+
+    def fingerprints(self):
+        return {kind: self.fingerprint(kind) for kind in KINDS}
+
+
+    def fingerprint(self, kind):
+        '''Rows have no mtime: the whole database file stands for every entity'''
+
+        if not os.path.isfile(self.db_path): return {}
+        stat = os.stat(self.db_path)
+        return {SqliteStorage.FILENAME: [stat.st_mtime_ns, stat.st_size]}
+
+
+    def remove_all(self):
+        self.db.close()
+        self._db = None
+        os.remove(self.db_path)
+
+
+BACKENDS = {JsonStorage.BACKEND: JsonStorage, ShardedStorage.BACKEND: ShardedStorage, SqliteStorage.BACKEND: SqliteStorage}
+
+
+def open_storage(path):
+    '''Returns the storage in use in the todolist directory'''
+
+    if os.path.isfile(os.path.join(path, SqliteStorage.FILENAME)):
+        return SqliteStorage(path)
+    if any(os.path.isdir(os.path.join(path, d)) for d in ShardedStorage.DIRECTORIES.values()):
+        return ShardedStorage(path)
+    return JsonStorage(path)
+
+
+def migrate(source, destination, keep=False):
+    '''Copies every entity from one storage to the other'''
+
+    count = 0
+    for kind in KINDS:
+        for name, info in source.load_all(kind).items():
+            destination.write(kind, name, info)
+            count += 1
+
+    if not keep: source.remove_all()
+    return count
@@ -1,7 +1,8 @@
-from asyncio import FastChildWatcher
 import os
-from .utilities import filesIO, now, never, diff_dates
-from .utilities import decorate_class, debugger, logger
+from .utilities import now, fatal_error
+from .storage import TASK
+from . import task_table
+from .task_table import to_ordinal, from_ordinal, today
 
 class Task():
     TODO = 'todo'
@@ -10,18 +11,20 @@ class Task():
     DEL = 'del'
 
     todolist = None
+
+    # A task is a view over a row of TodoList.table
+    __slots__ = ('table', 'row', 'dirty')
     
-    def __init__(self, name):
-        self.name = name
-        self.iname = int(name)
-        self.path = os.path.join(Task.todolist.path, name + '.task')
-        self.info = self.read()
-        
-        self.urgency    = 0
-        self.importance = 0
-        self.following  = []
-        self.projects   = [self.project] if self.project else [] 
-        self.due = never()
+    def __init__(self, name, info=None, create=False):
+        self.table = Task.todolist.table
+        self.dirty = False
+
+        if create: info = self._newborn_info()
+        elif info is None: info = Task.todolist.storage.read(TASK, name)
+        if info is None: fatal_error(f'no task numbered "{name}"')
+
+        self.row = self.table.append(name, info)
+        if create: self.write()
 
 
     def _newborn_info(self):
@@ -46,145 +49,203 @@ class Task():
 
 
     def read(self):
-        if os.path.isfile(self.path):
-            info = filesIO.read(self.path, loads=True)
-        else:
-            info = self._newborn_info()
+        info = Task.todolist.storage.read(TASK, self.name)
+        if info is None: fatal_error(f'no task numbered "{self.name}"')
         return info
 
 
     def write(self):
-        filesIO.write(self.path, self.info, dumps=True)
+        self.dirty = True
+        Task.todolist.write(TASK, self)
+
+
+    @property
+    def name(self):
+        return self.table.names[self.row]
+
+
+    @property
+    def iname(self):
+        return self.table.ids[self.row]
+
+
+    @property
+    def path(self):
+        return Task.todolist.storage.entity_path(TASK, self.name)
+
+
+    @property
+    def info(self):
+        return self.table.info(self.row)
 
 
     @property
     def status(self):
-        return self.info['status']
+        return task_table.STATUSES[self.table.status[self.row]]
         
 
     @property
     def followers(self):
-        return self.info['followers']
+        return list(self.table.followers[self.row])
         
     @followers.setter
     def followers(self, value):
-        self.info['followers'] = value
+        self.table.followers[self.row] = tuple(value)
         self.write()
 
     
     @property
     def description(self):
-        return self.info['description']
+        return self.table.descriptions[self.row]
         
     @description.setter
     def description(self, value):
-        old_value = self.info['description']
-        self.info['description'] = value
+        old_value = self.table.descriptions[self.row]
+        self.table.descriptions[self.row] = value
         if old_value != value: self.write()
 
 
     @property
     def project(self):
-        return self.info['project']
+        return self.table.project[self.row]
 
     @project.setter
     def project(self, value):
-        self.info['project'] = value
-        self.projects += [value]
+        self.table.project[self.row] = value
+        self.projects = self.projects + [value]
         self.write()
 
     
     @property
     def created(self):
-        return self.info['created']
+        return from_ordinal(self.table.created[self.row])
         
     @created.setter
     def created(self, value):
-        old_value = self.info['created']
-        self.info['created'] = value
-        if old_value != value: self.write()
+        old_value = self.table.created[self.row]
+        self.table.created[self.row] = to_ordinal(value)
+        if old_value != self.table.created[self.row]: self.write()
 
     
     @property
     def completed(self):
-        return self.info['completed']
-        
-    @completed.setter
-    def is_completed(self, value):
-        old_value = self.info['completed']
-        self.info['completed'] = value
-        if old_value != value: self.write()
+        return from_ordinal(self.table.completed[self.row])
 
 
     @property
     def time(self):
-        return self.info['time']
+        return self.table.hours(self.row)
         
     @time.setter
     def time(self, value):
-        old_value = self.info['time']
-        self.info['time'] = value
+        old_value = self.table.hours(self.row)
+        self.table.set_time(self.row, value)
         if old_value != value: self.write()
 
     
     @property
     def deleted(self):
-        return self.info['deleted']
-        
-    @deleted.setter
-    def is_deleted(self, value):
-        old_value = self.info['deleted']
-        self.info['deleted'] = value
-        if old_value != value: self.write()
+        return from_ordinal(self.table.deleted[self.row])
+
+
+    @property
+    def urgency(self):
+        return self.table.urgency[self.row]
+
+    @urgency.setter
+    def urgency(self, value):
+        self.table.urgency[self.row] = value
+
+
+    @property
+    def importance(self):
+        return self.table.importance[self.row]
+
+    @importance.setter
+    def importance(self, value):
+        self.table.importance[self.row] = value
+
+
+    @property
+    def due(self):
+        return from_ordinal(self.table.due[self.row])
+
+    @due.setter
+    def due(self, value):
+        self.table.due[self.row] = to_ordinal(value)
+
+
+    @property
+    def projects(self):
+        return self.table.projects[self.row]
+
+    @projects.setter
+    def projects(self, value):
+        self.table.projects[self.row] = value
+
+
+    @property
+    def following(self):
+        return self.table.following[self.row]
+
+    @following.setter
+    def following(self, value):
+        self.table.following[self.row] = value
+
+
+    @property
+    def shares(self):
+        return self.table.shares[self.row]
+
+    @shares.setter
+    def shares(self, value):
+        self.table.shares[self.row] = value
             
 
     def done(self):
-        self.info['status'] = Task.DONE
+        self.table.status[self.row] = task_table.DONE
         try: 
             day = os.environ['TODO_TODAY']
-            self.info['completed'] = day
+            self.table.completed[self.row] = to_ordinal(day)
         except:
-            self.info['completed'] = now()
+            self.table.completed[self.row] = today()
         self.write()
 
 
     def doing(self):
-        self.info['status'] = Task.INPROGRESS
+        self.table.status[self.row] = task_table.INPROGRESS
         self.write()
 
 
     def restore(self):
-        self.info['status'] = Task.TODO
-        self.info['completed'] = None
-        self.info['deleted'] = None
+        self.table.status[self.row] = task_table.TODO
+        self.table.completed[self.row] = 0
+        self.table.deleted[self.row] = 0
         self.write()   
 
 
     def delete(self):
-        self.info['status'] = Task.DEL
-        self.info['deleted'] = now()
+        self.table.status[self.row] = task_table.DEL
+        self.table.deleted[self.row] = today()
         self.write()
 
 
     def is_active(self):
-        if self.info['created'] > now(): return False
-        return self.info['status'] == Task.TODO or self.info['status'] == Task.INPROGRESS
+        if self.table.created[self.row] > today(): return False
+        return self.table.status[self.row] in (task_table.TODO, task_table.INPROGRESS)
 
 
     def is_completed(self):
-        return self.info['status'] == Task.DONE
+        return self.table.status[self.row] == task_table.DONE
 
     
     def is_inprogress(self):
-        return self.info['status'] == Task.INPROGRESS
+        return self.table.status[self.row] == task_table.INPROGRESS
         
 
     def is_deleted(self):
-        return self.info['deleted'] is not None
+        return self.table.deleted[self.row] != 0
 
 
     def is_scheduled(self):
-        return self.info['created'] > now()
-
-
-Task = decorate_class(Task, debugger(logger, 'Task'))
+        return self.table.created[self.row] > today()
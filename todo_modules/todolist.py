@@ -1,26 +1,61 @@
-from tkinter.messagebox import NO
-from .utilities import print, filesIO, GitWrapper, num2str, now, never, diff_dates
+from .utilities import print, filesIO, num2str, now
 from .utilities import fatal_error, get_valid_description
 from .utilities import decorate_class, debugger, logger, _c
 from .task import Task
 from .project import Project
-from biumsputils.print import Print
-import os, math
+from .storage import TASK, PROJECT, KINDS, BACKENDS, open_storage, migrate
+from .cache import DerivedCache
+from .registry import Registry
+from .graph import DependencyGraph, connected, find_path
+from .git_batch import BatchedGit
+from . import task_table
+from .task_table import TaskTable, to_ordinal, today
+from .scoring import score
+from .search import SearchIndex
+from .completion import CompletionIndex
+from .hierarchy import ProjectHierarchy
+from .membership import Membership, STATES
+from .ids import IdCounter
+from .archive import Archive
+from . import search, transfer
+from contextlib import contextmanager
+import os, sys, math, heapq, itertools, shutil, tempfile
 
 class LookupError(Exception): pass
 class NameError(Exception): pass
 
+# Stands for a task being added in the checks made before it has a number
+NEW_TASK = object()
+
 class TodoList():
 
-    def __init__(self, path):
+    def __init__(self, path, lazy=False):
         self.path = path
         self.__init()
-        self.git = GitWrapper(path)
+        self.storage = open_storage(path)
+        self.cache = DerivedCache(path)
+        self.git = BatchedGit(path)
+        self.search = SearchIndex(path)
+        self.completion = CompletionIndex(path)
+        self.archive = Archive(path)
+        self.ids = IdCounter(path, self.archive)
+        self._hierarchy = None
+        self.membership = None
 
         Project.todolist = self
         Task.todolist = self
 
-        self.refresh()
+        self._tasks = None
+        self._projects = None
+        self._entities = {}
+        self.table = TaskTable()
+        self._pending = None
+        self._written = []
+        self._underived = set()     # (kind, name) written since their derived fields were computed
+        self._from_archive = set()  # names of the tasks read from the archive
+        self._archive_loaded = False
+
+        if not lazy: self.refresh()
         
 
     def __init(self):
@@ -39,29 +74,131 @@ class TodoList():
         return date.strftime(r"%Y-%m-%d")
 
 
-    def _get_tasks(self):
-        tasks = []
-        for file in os.listdir(self.path):
-            if file.endswith('.task'):
-                task_file = file.replace('.task', '')
-                tasks.append(Task(task_file))
+    @property
+    def tasks(self):
+        if self._tasks is None: self.refresh()
+        return self._tasks
 
-        return tasks    
+    @tasks.setter
+    def tasks(self, value):
+        self._tasks = value
 
 
-    def _get_projects(self):
-        projects = []
-        for file in os.listdir(self.path):
-            if file.endswith('.project'):
-                project_file = file.replace('.project', '')
-                projects.append(Project(project_file))
+    @property
+    def projects(self):
+        if self._projects is None: self.refresh()
+        return self._projects
+
+    @projects.setter
+    def projects(self, value):
+        self._projects = value
+
+
+    @property
+    def loaded(self):
+        return self._tasks is not None
+
+
+    @contextmanager
+    def transaction(self):
+        '''Buffers the writes of tasks and projects: each touched file is written once, on success'''
+
+        if self._pending is not None: 
+            yield; return
+
+        self._pending = {}
+        try:
+            yield
+            self.flush()
+        finally:
+            self._pending = None
+
+
+    def write(self, kind, entity):
+        self._hierarchy = None
+        self._underived.add((kind, entity.name))
+        self.search.touch(kind, entity)
+        if kind == TASK: self.completion.update(entity.name, to_ordinal(entity.completed))
+        if kind == TASK and self.membership is not None: self.membership.update(entity)
+        if kind == TASK and entity.name in self._from_archive:
+            # Written back in the todo list, which shadows the archived copy
+            self._from_archive.discard(entity.name)
+            self.archive.unarchive(entity.name)
+        if self._pending is not None: 
+            self._pending[(kind, entity.name)] = entity
+            return
+
+        self.storage.write(kind, entity.name, entity.info)
+        entity.dirty = False
+        self._written.append(entity.path)
+        self._save_archive()
+        self.search.flush()
+
+
+    def flush(self):
+        '''Writes the tasks and projects modified in the current transaction'''
+
+        if not self._pending: return
+        self.storage.write_many([(kind, e.name, e.info) for (kind, _), e in self._pending.items()])
+        for e in self._pending.values(): 
+            e.dirty = False
+            self._written.append(e.path)
+        self._pending.clear()
+        self._save_archive()
+        self.search.flush()
+
+
+    def _save_archive(self):
+        path = self.archive.save()
+        if path is not None: self._written.append(path)
+
 
-        return projects
+    def _search(self, kind, query, match, ignore_case):
+        '''Names of the tasks or projects whose description matches the query'''
+
+        entities = self.tasks if kind == TASK else self.projects
+        texts = {e.name: search.text(kind, e) for e in entities if e.name not in self._from_archive}
+        found = self.search.find(kind, texts, query, match, ignore_case)
+        if kind == PROJECT or not self._from_archive: return found
+
+        # Archived tasks are not indexed: they come and go with load_archive
+        matches = search.matcher(query, match, ignore_case)
+        return found | {t.name for t in entities if t.name in self._from_archive and matches(search.text(kind, t))}
+
+
+    def _commit(self, path, message):
+        '''Commits the given path (or list of paths) and every file written since the last commit'''
+
+        self.flush()
+        paths = list(dict.fromkeys(([path] if isinstance(path, str) else list(path)) + self._written))
+        self._written = []
+        self.git.commit(paths, message)
+
+
+    def _get_entity(self, kind, name):
+        '''Loads a single task or project, without loading the whole todo list'''
+
+        if (kind, name) not in self._entities:
+            if self.storage.exists(kind, name): entity = Task(name) if kind == TASK else Project(name)
+            elif kind == TASK and name in self.archive.tasks():
+                entity = Task(name, self.archive.tasks()[name])
+                self._from_archive.add(name)
+            else: return None
+            self._entities[(kind, name)] = entity
+
+        return self._entities[(kind, name)]
+
+
+    def _get_tasks(self, infos):
+        return Registry(Task(name, info) for name, info in infos.items())
+
+
+    def _get_projects(self, infos):
+        return Registry(Project(name, info) for name, info in infos.items())
 
     
     def _get_project_by_name(self, project_name):
-        project_name = self._project_lookup(project_name).name
-        return [p for p in self.projects if p.name == project_name][0]
+        return self._project_lookup(project_name)
 
     
     def _task_lookup(self, name):
@@ -70,12 +207,19 @@ class TodoList():
         try: name = int(name)
         except: fatal_error(f'no task numbered "{name}"')
 
-        matches = [t for t in self.tasks if t.iname == name]
+        if not self.loaded:
+            if self._get_entity(TASK, num2str(name)) is None: fatal_error(f'no task numbered "{name}"')
+            return num2str(name)
 
-        if len(matches) == 0:
+        task = self.tasks.by_id(name)
+        if task is None and not self._archive_loaded:
+            self.load_archive()
+            task = self.tasks.by_id(name)
+
+        if task is None:
             fatal_error(f'no task numbered "{name}"')
         
-        return matches[0].name
+        return task.name
 
     
     def _project_lookup(self, name, only_name=False):
@@ -84,50 +228,35 @@ class TodoList():
         try: name = int(name)
         except: fatal_error(f'no project numbered "{name}"')
 
-        matches = [p for p in self.projects if p.iname == name]
+        if not self.loaded:
+            project = self._get_entity(PROJECT, num2str(name))
+            if project is None: fatal_error(f'no project numbered "{name}"')
+            return project.name if only_name else project
+
+        project = self.projects.by_id(name)
 
-        if len(matches) == 0:
+        if project is None:
             fatal_error(f'no project numbered "{name}"')
         
-        if only_name: return matches[0].name
-        return matches[0]
+        if only_name: return project.name
+        return project
 
 
 
     def _available_task_name(self):
-        if self.tasks:
-            return num2str(max([t.iname for t in self.tasks]) + 1)
-        else:
-            return '0000'
-
-    
-    def _available_project_name(self):
-        if self.projects:
-            return num2str(max([p.iname for p in self.projects]) + 1)
-        else:
-            return '0000'
+        return num2str(self.ids.allocate(self.storage, TASK))
 
-    def _compute_projects_level(self):
 
-        def compute_level(projects, done):
-            if not projects: return
+    def _available_project_name(self):
+        return num2str(self.ids.allocate(self.storage, PROJECT))
 
-            missing = []
-            for p in projects:
-                if p.parent == '':
-                    done.append(p.name)
 
-                else:
-                    parent = self._project_lookup(p.parent)
-                    if parent.name in done:
-                        p.level = parent.level + 1
-                        done.append(p.name)
-                    else:
-                        missing.append(p)
-            
-            return compute_level(missing, done)
+    @property
+    def hierarchy(self):
+        '''Index of the projects milestones, depth and status, until the next write'''
 
-        compute_level(self.projects, [])
+        if self._hierarchy is None: self._hierarchy = ProjectHierarchy(self.projects, self.membership)
+        return self._hierarchy
 
 
     def add(self, project, description, after, before, time, wait, commit):
@@ -141,11 +270,14 @@ class TodoList():
             before[i] = self._task_lookup(t)
 
         description = get_valid_description(description)
+        if wait: wait = self._validate_date(wait)
 
+        # Validated before its number is taken: a refused task uses none
+        self._check_dependencies(NEW_TASK, before, after)
         name = self._available_task_name()
-        task = Task(name)
+        task = Task(name, create=True)
 
-        if wait: task.created = self._validate_date(wait)
+        if wait: task.created = wait
 
         task.description = description
         task.time = time
@@ -159,8 +291,10 @@ class TodoList():
         
         if not commit: commit = f'Create task "{name}"'
 
-        self.refresh()
-        self.git.commit(task.path, commit)
+        if self.loaded: 
+            self.tasks.append(task)
+            self.refresh()
+        self._commit(task.path, commit)
         print(f'Created task {task.name}')
 
 
@@ -170,7 +304,7 @@ class TodoList():
         if milestone_of is not None: parent = self._project_lookup(milestone_of)
 
         name = self._available_project_name()
-        project = Project(name)
+        project = Project(name, create=True)
 
         project.due = self._validate_date(due)
         project.importance = int(importance)
@@ -178,9 +312,10 @@ class TodoList():
         project.reference = reference
 
         if milestone_of is not None: project.parent = parent.name
+        if self.loaded: self.projects.append(project)
 
         if not commit: commit = f'Create project "{name}"'
-        self.git.commit(project.path, commit)
+        self._commit(project.path, commit)
 
         if milestone_of:
             print(f'Created project {name}, milestone of {parent.name}')
@@ -204,6 +339,10 @@ class TodoList():
         for i, t in enumerate(before):
             before[i] = self._task_lookup(t)
 
+        if after or before:
+            followers = before if override else task.followers + before
+            self._check_dependencies(task.name, followers, after)
+
         if project: task.project = project.name
 
         if time is not None: task.time = time
@@ -216,7 +355,7 @@ class TodoList():
             self.add_followers_to_task(before, task=task, override=override)
 
         if not commit: commit = f'Edit task "{name}"'
-        self.git.commit(task.path, commit)
+        self._commit(task.path, commit)
 
         print(f'Edited task {task.name}: {task.description.splitlines()[0]}')
 
@@ -256,7 +395,7 @@ class TodoList():
             project.description = description
 
         if not commit: commit = f'Edit project "{project.name}"'
-        self.git.commit(project.path, commit)
+        self._commit(project.path, commit)
 
         print(f'Edited project {project.name}')
 
@@ -273,10 +412,27 @@ class TodoList():
             task.followers = list(followers)
             
 
+    def _check_dependencies(self, task_name, followers, following=()):
+        '''Refuses new followers that would close a dependency cycle through the task'''
+
+        new_followers = {task_name: list(followers)}
+        for name in following: new_followers[name] = self._get_task_by_name(name).followers + [task_name]
+
+        def followers_of(name):
+            if name in new_followers: return new_followers[name]
+            task = self.tasks.by_name(name) if self.loaded else self._get_entity(TASK, name)
+            return task.followers if task and task.is_active() else []
+
+        cycle = find_path(task_name, {task_name}, followers_of)
+        if cycle:
+            cycle = ['the new task' if name is NEW_TASK else name for name in cycle]
+            fatal_error(f'dependency cycle between tasks {" -> ".join(cycle)}')
+
+
     def add_due_to_task(self, date, task_name=None, task=None, override=False):
         if task is None:task = self._get_task_by_name(task_name)
 
-        for p in [Project(p) for p in task.projects]:
+        for p in [self._get_project_by_name(p) for p in task.projects]:
             if p.due < date:
                 if override: 
                     print(f'Moving project "{p.name}" due date from {p.due} to {date}')
@@ -289,17 +445,11 @@ class TodoList():
 
     def _get_task_by_name(self, name):
         name = self._task_lookup(name)
-        return [t for t in self.tasks if t.name == name][0]
-
-       
-    def _get_closest_due(self, projects):
-        due_dates = [p.due for p in projects]
-        due_dates.sort()
-
-        try: return due_dates[0]
-        except IndexError: return never()
+        if not self.loaded: return self._get_entity(TASK, name)
 
+        return self.tasks.by_name(name)
 
+       
     def __str__(self):
         return f'<TodoList>'
 
@@ -314,7 +464,7 @@ class TodoList():
         task.done()
 
         if not commit: commit = f'Mark task "{task_name}" as done'
-        self.git.commit(task.path, commit)
+        self._commit(task.path, commit)
 
         print(f'Completed task {task.name}: {task.description.splitlines()[0]}')
 
@@ -325,7 +475,7 @@ class TodoList():
         task.doing()
 
         if not commit: commit = f'Mark task "{task_name}" as in-progress'
-        self.git.commit(task.path, commit)
+        self._commit(task.path, commit)
 
         print(f'Working on task {task.name}: {task.description.splitlines()[0]}')
 
@@ -336,7 +486,7 @@ class TodoList():
         task.restore()
 
         if not commit: commit = f'Restore task "{task_name}"'
-        self.git.commit(task.path, commit)
+        self._commit(task.path, commit)
 
         print(f'Restored task {task.name}: {task.description.splitlines()[0]}')
 
@@ -347,56 +497,165 @@ class TodoList():
         task.delete()
 
         if not commit: commit = f'Delete task "{task_name}"'
-        self.git.commit(task.path, commit)
+        self._commit(task.path, commit)
 
         print(f'Deleted task {task.name}: {task.description.splitlines()[0]}')
 
 
-    def compute_importance(self):
-        def compute_task_importance(task, tasks, visited):
-            followers = [self._get_task_by_name(t) for t in task.followers]
-            followers = [t for t in followers if project.name in t.projects and t.is_active()]
-            followers = set(followers).intersection(tasks)
-            
-            tot = 1
-            visited.append(task.name)
-            for t in followers:
-                if not t.name in visited:
-                    tot += compute_task_importance(t, tasks, visited)
-            
-            return tot
+    def archive_tasks(self, days, commit):
+        '''Moves the tasks completed or deleted more than days ago to a new archive segment'''
 
-        for project in self.projects:
-            tasks = [t for t in self.tasks if project.name in t.projects and t.is_active()]
-            imp = []
+        if not self.loaded: self.refresh()
 
-            for task in tasks:
-                imp.append(compute_task_importance(task, set(tasks), []))
-            
-            imp = [i/sum(imp)*project.importance for i in imp]
-            for t, i in zip(tasks, imp): t.importance += i
+        table, cutoff = self.table, today() - days
+        tasks = [t for t in self.tasks if t.name not in self._from_archive 
+            and (table.status[t.row] == task_table.DONE and table.completed[t.row] <= cutoff
+                or table.status[t.row] == task_table.DEL and table.deleted[t.row] <= cutoff)]
+        if not tasks: print(f'No tasks completed or deleted more than {days} days ago'); return
+        tasks.sort(key=lambda t: t.iname)
 
-        for t in self.tasks: t.importance = math.floor(t.importance)
+        # Archived first: a task is never lost, at worst in both places
+        self.flush()
+        self.archive.append([(t.name, t.info) for t in tasks])
+        self.storage.remove_many((TASK, t.name) for t in tasks)
 
-    
-    def _compute_project_urgency(self, p):
+        self.refresh()
+        self.completion = CompletionIndex(self.path)
+
+        # The archive and the removed task files, not the caches next to them
+        paths = [self.archive.directory] + [self.storage.entity_path(TASK, t.name) for t in tasks]
+        if not commit: commit = f'Archive {len(tasks)} tasks'
+        self._commit(paths, commit)
 
-        WORKING_HOURS_PER_DAY = 4
-        
-        tasks = [t for t in self.tasks if p.name in t.projects and t.is_active()]
-        
-        # Estimated completion time
-        time = max(sum(t.time for t in tasks), 1)
-        
-        time_left = diff_dates(p.due, now()) # days
-        time_left = time_left*WORKING_HOURS_PER_DAY     # hours           
+        print(f'Archived {len(tasks)} tasks completed or deleted more than {days} days ago')
+
+
+    def migrate(self, backend, keep, commit):
+        if backend == self.storage.BACKEND: fatal_error(f'the todo list is already stored as {backend}')
+
+        source = self.storage
+        destination = BACKENDS[backend](self.path)
+        names = {kind: source.names(kind) for kind in KINDS}
+        count = migrate(source, destination, keep=keep)
+        self.storage = destination
+
+        # The files of both storages, not the caches next to them
+        paths = [storage.entity_path(kind, name) for storage in (source, destination) for kind in KINDS for name in names[kind]]
+        if not commit: commit = f'Migrate todo list to {backend}'
+        self._commit(paths, commit)
+
+        print(f'Migrated {count} tasks and projects from {source.BACKEND} to {backend}')
+
+
+    def export(self, path, format):
+        '''Writes every project, then every task, one record at a time'''
+
+        self.flush()
+        file = sys.stdout if path == '-' else open(path, 'w', newline='')
+        write = transfer.writer(file, format)
+
+        for kind, record in [(PROJECT, transfer.project_record), (TASK, transfer.task_record)]:
+            archived = self._archived_infos() if kind == TASK else {}
+            for name in sorted(self.storage.names(kind) + list(archived), key=int):
+                write(record(name, archived[name] if name in archived else self.storage.read(kind, name)))
+
+        if file is not sys.stdout: file.close()
 
-        # How many times could you complete the project in the time left
-        confidence = time_left/time
 
-        urgency = 100//max([confidence, 1])
+    def import_records(self, path, format, commit):
+        '''Adds the tasks and projects of a file of records, in two passes over it
 
-        return math.floor(urgency)
+        The first pass validates the records and names them, the second one
+        writes them in chunks. Only the names and the "after" references of
+        the records are kept in memory; standard input is spooled to a
+        temporary file. Dependency cycles are not checked: they are reported
+        when the todo list is loaded.
+        '''
+
+        if path == '-':
+            file = tempfile.TemporaryFile('w+', newline='')
+            shutil.copyfileobj(sys.stdin, file)
+            file.seek(0)
+        else: file = open(path, newline='')
+
+        names = {TASK: {}, PROJECT: {}}     # record id: position in the batch, then name
+        references = set()                  # (kind, id) not in the batch when met
+        after = {}                          # task id: positions of the batch tasks coming after it
+
+        for line, record in transfer.read(file, format):
+            kind, id, info, following = transfer.parse(record, line)
+            if id in names[kind]: fatal_error(f'line {line}: duplicate {kind} id "{id}"')
+            position = names[kind][id] = len(names[kind])
+
+            if kind == PROJECT: refs = [(PROJECT, info['parent'])] if info['parent'] else []
+            else: refs = [(PROJECT, info['project'])] + [(TASK, ref) for ref in info['followers'] + following]
+            references.update(r for r in refs if r[1] not in names[r[0]])
+            for ref in following: after.setdefault(ref, []).append(position)
+
+        def resolve(kind, id):
+            if id in names[kind]: return names[kind][id]
+            return self._task_lookup(id) if kind == TASK else self._project_lookup(id, only_name=True)
+
+        # Fail on unknown references before writing anything
+        for kind, id in references:
+            if id not in names[kind]: resolve(kind, id)
+
+        first = {kind: self.ids.allocate(self.storage, kind, len(names[kind])) for kind in KINDS}
+        names = {kind: {id: num2str(first[kind] + p) for id, p in names[kind].items()} for kind in KINDS}
+        followers = {resolve(TASK, id): [num2str(first[TASK] + p) for p in new] for id, new in after.items()}
+
+        def entities():
+            file.seek(0)
+            for line, record in transfer.read(file, format):
+                kind, id, info, _ = transfer.parse(record, line)
+                name = names[kind][id]
+                if kind == TASK:
+                    info['project'] = resolve(PROJECT, info['project'])
+                    info['followers'] = list(dict.fromkeys(
+                        [resolve(TASK, ref) for ref in info['followers']] + followers.pop(name, [])))
+                elif info['parent']: info['parent'] = resolve(PROJECT, info['parent'])
+                yield kind, name, info
+
+        stream = entities()
+        while True:
+            chunk = list(itertools.islice(stream, 1000))
+            if not chunk: break
+            self.storage.write_many(chunk)
+        file.close()
+
+        # Existing tasks that batch tasks come after
+        for name, new in followers.items(): self.add_followers_to_task(new, task_name=name)
+
+        tasks, projects = len(names[TASK]), len(names[PROJECT])
+        if not commit: commit = f'Import {tasks} tasks and {projects} projects'
+        if self.loaded: self.refresh()
+        paths = [self.storage.entity_path(kind, name) for kind in KINDS for name in names[kind].values()]
+        self._commit(paths, commit)
+
+        print(f'Imported {tasks} tasks and {projects} projects')
+
+
+    def compute_importance(self, projects=None, tasks=None):
+        if projects is None: projects = self.projects
+        if tasks is None: tasks = self.tasks
+
+        names = {p.name for p in projects}
+        for t in tasks:
+            if t.shares: t.shares = {name: i for name, i in t.shares.items() if name not in names}
+
+        for project in projects:
+            project_tasks = [self.tasks.by_name(name) for name in sorted(self.membership.tasks(project.name))]
+            if not project_tasks: continue
+
+            # A task weighs as much as the tasks (transitively) waiting for it
+            counts = DependencyGraph(project_tasks).reachable_counts()
+            imp = [counts[t.name] for t in project_tasks]
+            
+            total = sum(imp)
+            imp = [i/total*project.importance for i in imp]
+            for t, i in zip(project_tasks, imp): t.shares[project.name] = i
+
+        for t in tasks: t.importance = math.floor(sum(t.shares.values()))
 
     
     def report(self, date_range, machine, info):
@@ -404,84 +663,232 @@ class TodoList():
         start = self._validate_date(date_range[0], past_is_ok=True)
         stop  = self._validate_date(date_range[1], past_is_ok=True)
 
-        tasks = []
-        for t in self.tasks:
-            if t.completed and start <= t.completed <= stop and t.time > 0: tasks.append(t)
-        
-        tasks.sort(key=lambda t: t.name)
+        # Due dates are derived: only they need the whole todo list
+        if info == 2 and not machine and not self.loaded: self.refresh()
+        if not self.completion.loaded: self.completion.load(self.storage)
 
-        if not machine:
+        # The completion index only knows the tasks in the todo list
+        first, last = to_ordinal(start), to_ordinal(stop)
+        archived = [name for name, info in self._archived_infos().items() if first <= to_ordinal(info['completed']) <= last]
+        names = sorted(set(self.completion.between(first, last)).union(archived), key=int)
+        tasks = (self._get_task_by_name(name) for name in names)
+        tasks = (t for t in tasks if t.time > 0)
 
-            if start == stop: print.add(f"Completed tasks on {start}")
-            else: print.add(f"Completed tasks between {start} and {stop}")
+        if machine:
+            for t in tasks:
+                print('\t'.join([t.completed, t.name, t.project, str(t.time), t.description.splitlines()[0]]))
+            return
 
-            print.add(f"Total: {len(tasks)} tasks, {round(sum(t.time for t in tasks), 1)} [h]")
+        tasks = list(tasks)
 
-            if info == 2:
-                print.add('{:^4} {:^10} {:^4} - {}'.format('ID', 'due-date', 'P-ID', 'description'), color='orange')
+        if start == stop: print.add(f"Completed tasks on {start}")
+        else: print.add(f"Completed tasks between {start} and {stop}")
 
-                for t in tasks:
-                    print.add('{:4} {:10} {:^4} - {}'.format(t.name, t.due, t.project, t.description.splitlines()[0]))
+        print.add(f"Total: {len(tasks)} tasks, {round(sum(t.time for t in tasks), 1)} [h]")
 
-            if info == 1:
-                print.add('{:^4} {:^4} {:^4} - {}'.format('ID', 'P-ID', 'time', 'description'), color='orange')
+        if info == 2:
+            print.add('{:^4} {:^10} {:^4} - {}'.format('ID', 'due-date', 'P-ID', 'description'), color='orange')
 
-                for t in tasks:
-                    print.add('{:^4} {:^4} {:^4} - {}'.format(t.name, t.project, t.time, t.description.splitlines()[0]))
+            for t in tasks:
+                print.add('{:4} {:10} {:^4} - {}'.format(t.name, t.due, t.project, t.description.splitlines()[0]))
 
-            else:
-                print.add('{:^4} {:^4} - {}'.format('ID', 'P-ID', 'description'), color='orange')
+        if info == 1:
+            print.add('{:^4} {:^4} {:^4} - {}'.format('ID', 'P-ID', 'time', 'description'), color='orange')
 
-                for t in tasks:
-                    print.add('{:4} {:^4} - {}'.format(t.name, t.project, t.description.splitlines()[0]))
+            for t in tasks:
+                print.add('{:^4} {:^4} {:^4} - {}'.format(t.name, t.project, t.time, t.description.splitlines()[0]))
+
+        else:
+            print.add('{:^4} {:^4} - {}'.format('ID', 'P-ID', 'description'), color='orange')
+
+            for t in tasks:
+                print.add('{:4} {:^4} - {}'.format(t.name, t.project, t.description.splitlines()[0]))
 
-            print.empty()
+        print.empty()
 
 
     def refresh(self):
 
-        self.tasks = self._get_tasks()
-        self.projects = self._get_projects()
+        self.flush()
+        self._hierarchy = None
+        self._underived = set()
+        self._from_archive = set()
+        self._archive_loaded = False
+        self.archive.forget()
+        self.table = TaskTable()
+        fingerprints = self.storage.fingerprints()
+        infos = self.cache.infos(self.storage, fingerprints)
+        self.tasks = self._get_tasks(infos[TASK])
+        self.projects = self._get_projects(infos[PROJECT])
+
+        stale = self.cache.apply(self)
+
+        if stale is None:
+            self._propagate(self.tasks)
+            self.membership = Membership(self.tasks, self.archive)
+            self._score(self.projects, self.tasks)
+
+        else:
+            tasks, affected = stale
+            self._propagate(tasks)
+            self.membership = Membership(self.tasks, self.archive)
+            for t in tasks: affected.update(t.projects)
+
+            region = set(tasks)
+            projects = [p for p in self.projects if p.name in affected]
+            self._score(projects, [t for t in self.tasks if t in region or not affected.isdisjoint(t.projects)])
+
+        self.cache.save(self, fingerprints, infos)
+
+
+    def reload(self, changed=None):
+        '''Reads again the tasks and projects changed on disk since they were loaded
+
+        changed: the (kind, name) of the entities whose file changed, None if
+        any may have. The entities written through the todo list since it was
+        loaded count as changed too: their derived fields are computed again.
+        Only the dependency chains of the changed tasks, and the tasks of the
+        changed projects, are propagated and scored again; removed entities
+        reload everything.
+        '''
+
+        underived, self._underived = self._underived, set()
+        if changed is not None: changed = set(changed) | underived
+        if changed is not None and not changed: return
+
+        if not self.loaded:
+            self._entities.clear()
+            self._from_archive.clear()
+            self.archive.forget()
+            self.completion = CompletionIndex(self.path)
+            return
+
+        self.flush()
+        if self.archive.changed(): return self.refresh()
+        if changed is None:
+            infos = {(kind, name): info for kind, entities in self.storage.load_everything().items() for name, info in entities.items()}
+            removed = [e for kind in KINDS for e in (self.tasks if kind == TASK else self.projects)
+                if (kind, e.name) not in infos and not (kind == TASK and e.name in self._from_archive)]
+            if removed: return self.refresh()
+        else:
+            infos = {(kind, name): self.storage.read(kind, name) for kind, name in changed}
+            if None in infos.values(): return self.refresh()
+
+        tasks, projects, seeds = [], [], set()
+        for (kind, name), info in infos.items():
+            entity = (self.tasks if kind == TASK else self.projects).by_name(name)
+            if entity is not None and entity.info == info and (kind, name) not in underived: continue
 
-        for _ in range(5):
-            for t in self.tasks:
-                if not t.is_active(): continue
+            if kind == PROJECT:
+                if entity is None: self.projects.append(Project(name, info))
+                else: entity.info = info
+                projects.append(name)
+                for state in STATES: seeds.update(self.membership.tasks(name, state))
 
-                sp = set(t.projects)
-                followers_tasks = [self._get_task_by_name(name) for name in t.followers]
-                for ft in followers_tasks:
-                    if not ft.is_active(): continue
-                    if t.name not in ft.following: ft.following += [t.name]
-                    sp = sp.union(set(ft.projects))
+            elif entity is None:
+                entity = Task(name, info)
+                self.tasks.append(entity)
+                tasks.append(entity)
 
-                following_tasks = [self._get_task_by_name(name) for name in t.following]
-                for ft in following_tasks:
-                    if not ft.is_active(): continue
-                    if t.name not in ft.followers: ft.followers += [t.name]
+            else:
+                seeds.update(entity.followers, entity.following)     # as they were before the change
+                self.table.replace(entity.row, info)
+                tasks.append(entity)
 
-                for p in [self._project_lookup(p) for p in sp]:
-                    if p.parent: 
-                        parent = self._project_lookup(p.parent)
-                        sp.add(parent.name)
+        if not tasks and not projects: return
 
-                t.projects = list(sp)
+        region = connected(self.tasks, seeds | {t.name for t in tasks})
+        region = [t for t in self.tasks if t.name in region]
 
-        for p in self.projects:
-            p.urgency = self._compute_project_urgency(p)
+        affected = set(projects)
+        for t in region:
+            affected.update(self.membership.indexed.get(t.name, (None, ()))[1])
+            t.projects, t.following = [t.project] if t.project else [], []
 
-        for t in self.tasks:
-            projects = [self._get_project_by_name(p) for p in t.projects]
-            t.due = self._get_closest_due(projects)
-            t.urgency = max([p.urgency for p in projects])
-        
-        self.compute_importance()
+        self._hierarchy = None
+        self._propagate(region)
+        for t in region:
+            self.membership.update(t)
+            affected.update(t.projects)
+        for t in tasks: self.completion.update(t.name, to_ordinal(t.completed))
+
+        region = set(region)
+        self._score([p for p in self.projects if p.name in affected],
+            [t for t in self.tasks if t in region or not affected.isdisjoint(t.projects)])
+
+
+    def _archived_infos(self):
+        '''{name: info} of the archived tasks, but those written again in the todo list'''
+
+        if self.loaded: hot = {t.name for t in self.tasks}.difference(self._from_archive)
+        else:
+            self.flush()
+            hot = set(self.storage.names(TASK))
+        return {name: info for name, info in self.archive.tasks().items() if name not in hot}
+
+
+    def load_archive(self):
+        '''Adds the archived tasks to the todo list, for the views of completed and deleted tasks'''
+
+        if not self.loaded: self.refresh()
+        if self._archive_loaded: return
+        self._archive_loaded = True
+
+        tasks = [Task(name, info) for name, info in self._archived_infos().items() if self.tasks.by_name(name) is None]
+        for t in tasks:
+            self.tasks.append(t)
+            self.membership.update(t)
+            self._from_archive.add(t.name)
+        self._score([], tasks)
+
+
+    def _propagate(self, tasks):
+        '''Propagates projects and dependencies along the followers graph, in one topological pass'''
+
+        graph = DependencyGraph(t for t in tasks if t.is_active())
+
+        for cycle in graph.cycles():
+            print(f'Warning: dependency cycle between tasks {", ".join(cycle)}', color='orange')
+
+        ancestors = {}
+        for component in graph.components():
+            sp = set()
+            for name in component:
+                sp.update(graph.tasks[name].projects)
+                for follower in graph.followers[name]: sp.update(graph.tasks[follower].projects)
+
+            for p in list(sp): sp.update(self._get_project_ancestors(p, ancestors))
+            for name in component: graph.tasks[name].projects = list(sp)
+
+        for name, following in graph.following.items():
+            graph.tasks[name].following = following
+
+
+    def _get_project_ancestors(self, project_name, ancestors):
+        '''Names of the parent, grandparent, ... of a project, memoized in ancestors'''
+
+        if project_name not in ancestors:
+            ancestors[project_name] = []
+            parent = self._project_lookup(project_name).parent
+            if parent: ancestors[project_name] = [parent] + self._get_project_ancestors(parent, ancestors)
+
+        return ancestors[project_name]
+
+
+    def _score(self, projects, tasks):
+        '''Computes urgency, due date and importance of the given projects and tasks'''
+
+        score(projects, tasks, self.projects, self.table, self.membership)
+        self.compute_importance(projects, tasks)
 
     
     def _get_project_milestones(self, project):
-        return [p for p in self.projects if p.parent == project.name]
+        return self.hierarchy.children[project.name]
 
 
     def show(self, task_name):
+        if not self.loaded: self.refresh()
+
         t = self._get_task_by_name(task_name)
         project = self._get_project_by_name(t.project)
 
@@ -500,6 +907,8 @@ class TodoList():
         ))
 
     def show_project(self, project_name):
+        if not self.loaded: self.refresh()
+
         p = self._get_project_by_name(project_name)
 
         milestones = self._get_project_milestones(p)
@@ -518,49 +927,61 @@ class TodoList():
         print("\nDescription:\n   {}".format(p.description.replace('\n', '\n   ')))
         
 
-    def list(self, sort, projects, active, completed, deleted, waiting, filter, filter_project, limit, info, one_line):
+    def _task_sort_key(self, sort):
+        '''The sort mode as one composite key: smallest first, newest first on ties'''
 
-        if sort in ['importance', 'I']: 
-            self.tasks.sort(key=lambda t: t.name, reverse=True)
-            self.tasks.sort(key=lambda t: t.urgency, reverse=True)
-            self.tasks.sort(key=lambda t: t.importance, reverse=True)
+        table = self.table
+        importance, urgency, ids = table.importance, table.urgency, table.ids
 
-        elif sort in ['creation', 'C']:
-            self.tasks.sort(key=lambda t: t.name, reverse=True)
+        if sort in ['importance', 'I']: return lambda t: (-importance[t.row], -urgency[t.row], -ids[t.row])
+        if sort in ['creation', 'C']: return lambda t: -ids[t.row]
+        return lambda t: (-urgency[t.row], -importance[t.row], -ids[t.row])
 
-        else:
-            self.tasks.sort(key=lambda t: t.name, reverse=True)
-            self.tasks.sort(key=lambda t: t.importance, reverse=True)
-            self.tasks.sort(key=lambda t: t.urgency, reverse=True)
+
+    def _project_sort_key(self, sort):
+        if sort in ['importance', 'I']: return lambda p: (-p.importance, -p.urgency, -p.iname)
+        if sort in ['creation', 'C']: return lambda p: -p.iname
+        return lambda p: (-p.urgency, -p.importance, -p.iname)
+
+
+    def list(self, sort, projects, active, completed, deleted, waiting, filter, filter_project, limit, info, one_line,
+            match=search.SUBSTRING, ignore_case=False, offset=0):
+
+        if not self.loaded: self.refresh()
+        if completed or deleted: self.load_archive()
 
         projects = [self._project_lookup(p) for p in projects]
         tasks = []
         inprogress = []
         scheduled = []
+        matches = self._search(TASK, filter, match, ignore_case) if filter else None
+        project_matches = self._search(PROJECT, filter_project, match, ignore_case) if filter_project else None
+
+        table, day = self.table, today()
         for t in self.tasks:
             stop = True
-            if t.is_scheduled(): scheduled.append(t); continue
-            if t.is_deleted() and not deleted: continue
-            if t.is_completed() and not completed: continue
-            if t.is_active() and not active: continue
-            if filter not in t.description: continue
-
-            if filter_project:
-                for p in [self._project_lookup(p) for p in t.projects]: 
-                    if filter_project in p.description: stop = False
-                if stop: continue
+            r = t.row
+            status = table.status[r]
+            if table.created[r] > day: scheduled.append(t); continue
+            if table.deleted[r] and not deleted: continue
+            if status == task_table.DONE and not completed: continue
+            if status in (task_table.TODO, task_table.INPROGRESS) and not active: continue
+            if matches is not None and t.name not in matches: continue
+            if project_matches is not None and project_matches.isdisjoint(t.projects): continue
 
             if projects: 
                 projects_names = [p.name for p in projects]
                 for p in t.projects: 
                     if p in projects_names: stop = False
                 if stop: continue
-            if t.is_inprogress(): inprogress.append(t); continue
+            if status == task_table.INPROGRESS: inprogress.append(t); continue
 
             tasks.append(t)
 
-
-        if limit < len(tasks): tasks = tasks[:limit]
+        key = self._task_sort_key(sort)
+        tasks = heapq.nsmallest(offset + limit, tasks, key=key)[offset:]
+        inprogress.sort(key=key)
+        scheduled.sort(key=key)
 
         if waiting:
             if one_line:
@@ -712,28 +1133,32 @@ class TodoList():
 
     def stats(self):
 
+        self.load_archive()
         active_projects  = [p for p in self.projects if self._is_project_active(p)]
-        inprogress_tasks = [t for t in self.tasks if t.is_inprogress()]
-        active_tasks     = [t for t in self.tasks if t.is_active()]
-        completed_tasks  = [t for t in self.tasks if t.is_completed()]
+
+        table, day = self.table, today()
+        active_codes = (task_table.TODO, task_table.INPROGRESS)
+        inprogress_tasks = [r for r, s in enumerate(table.status) if s == task_table.INPROGRESS]
+        active_tasks     = [r for r, s in enumerate(table.status) if s in active_codes and table.created[r] <= day]
+        completed_tasks  = [r for r, s in enumerate(table.status) if s == task_table.DONE]
+
+        def hours(rows): return round(sum(table.hours(r) for r in rows), 1)
         
         print.add('Projects', color='orange')
         print.add(f'\tactive: {len(active_projects)}')
         print.add(f'\tcompleted: {len(self.projects)}')
 
         print.add('Tasks', color='orange')
-        print.add(f'\tin progress: {len(inprogress_tasks)}, {round(sum(t.time for t in inprogress_tasks), 1)} [h]')
-        print.add(f'\tactive: {len(active_tasks)}, {round(sum(t.time for t in active_tasks), 1)} [h]')
-        print.add(f'\tcompleted: {len(completed_tasks)}, {round(sum(t.time for t in completed_tasks), 1)} [h]')
+        print.add(f'\tin progress: {len(inprogress_tasks)}, {hours(inprogress_tasks)} [h]')
+        print.add(f'\tactive: {len(active_tasks)}, {hours(active_tasks)} [h]')
+        print.add(f'\tcompleted: {len(completed_tasks)}, {hours(completed_tasks)} [h]')
 
         print.empty()
 
     
     def priority(self):
-        self.projects.sort(key=lambda p: p.name, reverse=True)
-        self.projects.sort(key=lambda p: p.importance, reverse=True)
-        self.projects.sort(key=lambda p: p.urgency, reverse=True)
         projects = [p for p in self.projects if self._is_project_active(p)]
+        projects.sort(key=self._project_sort_key('urgency'))
 
         if not projects: print('No active projects in the todo list'); return
         if len(projects) == 1: 
@@ -761,122 +1186,83 @@ class TodoList():
 
     
     def _is_project_active(self, p):
-        project_tasks = []
-        for t in self.tasks:
-            if p.name in t.projects:
-                project_tasks.append(t)
-        
-        if not project_tasks: return True   # Consider projects with no tasks as active
-        project_tasks = [t for t in project_tasks if t.is_active()]
-
-        return len(project_tasks) > 0   # Or projects with active tasks
+        return self.membership.is_active(p.name)
 
     
     def _is_project_completed(self, p):
         return not self._is_project_active(p)
 
     
-    def _get_children(self, project):
-        return [p for p in self.projects if p.parent == project.name]
-
-
-    def tree(self, sort, limit, active, completed, info, project=None):
+    def tree(self, sort, limit, active, completed, info, project=None, depth=None):
+        '''Prints the projects hierarchy, from the given project or from every root, down to depth levels'''
 
-        def project_tree(projects):
-            if not projects: return
+        hierarchy = self.hierarchy
+        key = self._project_sort_key(sort)
 
-            for p in projects:
-                self.list_projects(sort, limit, active, completed, True, '', info, project_list=[p.name], header=False)
-                children = self._get_children(p)
+        def project_tree(projects, level):
+            for p in sorted(projects, key=key):
+                if (p.is_active() and active) or (p.is_completed() and completed):
+                    print.add(self._project_line(p, info))
+                    print.empty()
 
-                if not children: continue
+                children = hierarchy.children[p.name]
+                if not children or (depth is not None and level >= depth): continue
                 print.up()
-                project_tree(children)
+                project_tree(children, level + 1)
                 print.down()
                 print()
 
+        roots = [self._get_project_by_name(project)] if project else hierarchy.roots
 
-        self._compute_projects_level()
-
-        if project: 
-            project = self._project_lookup(project, only_name=True)
-            roots = [p for p in self.projects if p.level == 0 and p.name == project]
-        else:
-            roots = [p for p in self.projects if p.level == 0]
-        
         print.auto_indent()
-        project_tree(roots)
+        project_tree(roots, 0)
         print.no_indent()
 
 
-    def list_projects(self, sort, limit, active, completed, milestones, filter, info, project_list=None, header=True):
+    def list_projects(self, sort, limit, active, completed, milestones, filter, info, project_list=None, header=True,
+            match=search.SUBSTRING, ignore_case=False, offset=0):
         
-        self._compute_projects_level()
+        self.hierarchy
 
         if project_list: 
             project_list = [self._project_lookup(p, only_name=True) for p in project_list]
             milestones = True
-        
-
-        if sort in ['importance', 'I']: 
-            self.tasks.sort(key=lambda p: p.name, reverse=True)
-            self.projects.sort(key=lambda p: p.urgency, reverse=True)
-            self.projects.sort(key=lambda p: p.importance, reverse=True)
-
-        elif sort in ['creation', 'C']:
-            self.tasks.sort(key=lambda p: p.name, reverse=True)
-
-        else:
-            self.tasks.sort(key=lambda p: p.name, reverse=True)
-            self.projects.sort(key=lambda p: p.importance, reverse=True)
-            self.projects.sort(key=lambda p: p.urgency, reverse=True)
 
         projects = []
+        matches = self._search(PROJECT, filter, match, ignore_case) if filter else None
         if filter: completed = milestones = active = True
         for p in self.projects:
-            p.status = Project.ACTIVE if self._is_project_active(p) else Project.COMPLETED
-
             if project_list is not None and p.name not in project_list: continue
             if p.level and not milestones: continue
             if p.is_completed() and not completed: continue
             if p.is_active() and not active: continue
-            if filter not in p.description+p.reference: continue
+            if matches is not None and p.name not in matches: continue
 
             projects.append(p)
 
-        if limit < len(projects): projects = projects[:limit]
-
-        if info > 2:
-            if header: print.add((_c.orange + 'P-ID  {:9} {:^10} {:^7} - {}' + _c.reset).format(
-                'status', 'due-date', 'I/U', 'description'))
+        projects = heapq.nsmallest(offset + limit, projects, key=self._project_sort_key(sort))[offset:]
 
-            for p in projects:
-                print.add((_c.green + '{:5} {:9} {:10} {:>3}/{:<3} - ' + _c.reset + '{}').format(
-                    p.name, p.status, p.due, p.importance, p.urgency, p.description.splitlines()[0]))
+        if header: print.add(self._project_header(info))
+        for p in projects: print.add(self._project_line(p, info))
 
-        elif info == 2:
-            if header: print.add((_c.orange + 'P-ID {:^10}  {:^7} - {}' + _c.reset).format(
-                'due-date', 'I/U', 'description'))
-
-            for p in projects:
-                print.add((_c.green + '{:5} {:10} {:>3}/{:<3} - ' + _c.reset + '{}').format(
-                    p.name, p.due, p.importance, p.urgency, p.description.splitlines()[0]))
-
-        elif info == 1:
-            if header: print.add((_c.orange + 'P-ID  {:^10} - {}' + _c.reset).format(
-                'due-date', 'description'))
+        print.empty()
 
-            for p in projects:
-                print.add((_c.green + '{:5} {:10} - ' + _c.reset + '{}').format(
-                    p.name, p.due, p.description.splitlines()[0]))
 
-        elif info == 0:
-            if header: print.add((_c.orange + 'P-ID - {}' + _c.reset).format('description'))
+    def _project_header(self, info):
+        if info > 2: return (_c.orange + 'P-ID  {:9} {:^10} {:^7} - {}' + _c.reset).format('status', 'due-date', 'I/U', 'description')
+        if info == 2: return (_c.orange + 'P-ID {:^10}  {:^7} - {}' + _c.reset).format('due-date', 'I/U', 'description')
+        if info == 1: return (_c.orange + 'P-ID  {:^10} - {}' + _c.reset).format('due-date', 'description')
+        return (_c.orange + 'P-ID - {}' + _c.reset).format('description')
 
-            for p in projects:
-                print.add((_c.green + '{:4} - ' + _c.reset + '{}').format(p.name, p.description.splitlines()[0]))
 
+    def _project_line(self, p, info):
+        description = p.description.splitlines()[0]
 
-        print.empty()
+        if info > 2: return (_c.green + '{:5} {:9} {:10} {:>3}/{:<3} - ' + _c.reset + '{}').format(
+            p.name, p.status, p.due, p.importance, p.urgency, description)
+        if info == 2: return (_c.green + '{:5} {:10} {:>3}/{:<3} - ' + _c.reset + '{}').format(
+            p.name, p.due, p.importance, p.urgency, description)
+        if info == 1: return (_c.green + '{:5} {:10} - ' + _c.reset + '{}').format(p.name, p.due, description)
+        return (_c.green + '{:4} - ' + _c.reset + '{}').format(p.name, description)
 
 #TodoList = decorate_class(TodoList, debugger(logger, 'TodoList'))
\ No newline at end of file
@@ -0,0 +1,28 @@
+import os
+from .utilities import decorate_class, debugger, logger
+
+# Set to any value to trace Task and Project calls without the --logging-* flags
+TRACE_ENV = 'TODO_TRACE'
+
+_enabled = False
+
+
+def tracing_requested():
+    return bool(os.getenv(TRACE_ENV))
+
+
+def enable_tracing():
+    '''Wraps the Task and Project methods with the logging debugger
+
+    Off by default: every attribute access in refresh() and list() would go
+    through the wrapper. Call it before building the TodoList.
+    '''
+
+    global _enabled
+    if _enabled: return
+    _enabled = True
+
+    from . import task, project, todolist
+
+    task.Task = todolist.Task = decorate_class(task.Task, debugger(logger, 'Task'))
+    project.Project = todolist.Project = decorate_class(project.Project, debugger(logger, 'Project'))
@@ -0,0 +1,137 @@
+'''Tasks and projects as JSONL or CSV records, for bulk import and export
+
+A record is a flat dict with a type (task or project), an id and the fields
+of the entity. Records reference each other by id: the project of a task,
+the parent of a project and the tasks a task comes before/after. An id that
+is not in the batch is the number of an existing task or project.
+'''
+import csv, json
+from datetime import date
+from .utilities import fatal_error, now, never
+from .storage import TASK, PROJECT
+from .task_table import STATUSES
+
+JSONL, CSV = 'jsonl', 'csv'
+FORMATS = [JSONL, CSV]
+
+COLUMNS = ['type', 'id', 'project', 'parent', 'description', 'status', 'time', 'importance',
+    'due', 'created', 'completed', 'deleted', 'reference', 'before', 'after']
+LISTS = ['before', 'after']     # space separated in CSV
+
+
+def guess_format(filename):
+    return CSV if filename.lower().endswith('.csv') else JSONL
+
+
+def read(file, format):
+    '''Yields the line number and the record of each entity in the file'''
+
+    if format == CSV:
+        reader = csv.DictReader(file)
+        for row in reader:
+            record = {k: v for k, v in row.items() if v not in ('', None)}
+            for k in LISTS:
+                if k in record: record[k] = record[k].split()
+            yield reader.line_num, record
+        return
+
+    for i, line in enumerate(file, 1):
+        if not line.strip(): continue
+        try: yield i, json.loads(line)
+        except json.JSONDecodeError as e: fatal_error(f'line {i}: {e}')
+
+
+def writer(file, format):
+    '''Returns a function writing a record to the file'''
+
+    if format == CSV:
+        w = csv.DictWriter(file, COLUMNS, extrasaction='ignore', lineterminator='\n')
+        w.writeheader()
+        return lambda record: w.writerow({k: ' '.join(v) if k in LISTS else v for k, v in record.items()})
+
+    return lambda record: file.write(json.dumps(record) + '\n')
+
+
+def task_record(name, info):
+    record = {'type': TASK, 'id': name}
+    record.update((k, info[k]) for k in ['project', 'description', 'status', 'time', 'created', 'completed', 'deleted'])
+    record['before'] = info['followers']
+    return record
+
+
+def project_record(name, info):
+    record = {'type': PROJECT, 'id': name}
+    record.update((k, info[k]) for k in ['parent', 'description', 'importance', 'due', 'created', 'reference'])
+    return record
+
+
+def check_date(record, key, line, default=None):
+    value = record.get(key) or default
+    if value is None: return None
+    try: date.fromisoformat(value)
+    except (TypeError, ValueError): fatal_error(f'line {line}: invalid {key} date "{value}", expected YYYY-MM-DD')
+    return value
+
+
+def check_number(record, key, line, type, default):
+    try: return type(record.get(key, default))
+    except (TypeError, ValueError): fatal_error(f'line {line}: invalid {key} "{record[key]}"')
+
+
+def hours(value):
+    '''A time as given: whole hours stay an int, as in the task files'''
+
+    if isinstance(value, int) and not isinstance(value, bool): return value
+    if isinstance(value, str) and '.' not in value:
+        try: return int(value)
+        except ValueError: pass
+    return float(value)
+
+
+def check_list(record, key, line):
+    value = record.get(key, [])
+    if not isinstance(value, list): fatal_error(f'line {line}: {key} must be a list of ids')
+    return [str(v) for v in value]
+
+
+def parse(record, line):
+    '''Validates a record: returns its kind, id, entity info and the ids of the tasks it comes after
+
+    References to other records are left unresolved.
+    '''
+
+    if not isinstance(record, dict): fatal_error(f'line {line}: not a record')
+    kind = record.get('type')
+    if kind not in (TASK, PROJECT): fatal_error(f'line {line}: type must be "{TASK}" or "{PROJECT}"')
+    if record.get('id') in (None, ''): fatal_error(f'line {line}: missing id')
+
+    description = str(record.get('description', ''))
+    if not description.strip(): fatal_error(f'line {line}: description cannot be empty')
+    if not description.endswith('\n'): description += '\n'
+
+    if kind == PROJECT:
+        info = {
+            'description': description,
+            'importance': check_number(record, 'importance', line, int, 100),
+            'due': check_date(record, 'due', line, never()),
+            'created': check_date(record, 'created', line, now()),
+            'parent': str(record.get('parent') or ''),
+            'reference': str(record.get('reference') or '')
+        }
+        return kind, str(record['id']), info, []
+
+    status = record.get('status', STATUSES[0])
+    if status not in STATUSES: fatal_error(f'line {line}: status must be one of {", ".join(STATUSES)}')
+    if not record.get('project'): fatal_error(f'line {line}: a task needs a project')
+
+    info = {
+        'description': description,
+        'status': status,
+        'followers': check_list(record, 'before', line),
+        'project': str(record['project']),
+        'time': check_number(record, 'time', line, hours, 1.),
+        'created': check_date(record, 'created', line, now()),
+        'completed': check_date(record, 'completed', line),
+        'deleted': check_date(record, 'deleted', line)
+    }
+    return kind, str(record['id']), info, check_list(record, 'after', line)
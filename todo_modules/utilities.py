@@ -3,11 +3,11 @@ from biumsputils.decorators import debugger, decorate_module, decorate_class
 from biumsputils.logger import logger
 from biumsputils.print import print
 from biumsputils.editor_input import editor_input
-from biumsputils.git_wrapper import GitWrapper
 from biumsputils.fatal_error import fatal_error
 from biumsputils.input_validation import *
 from biumsputils.colorcodes import Colorcodes
 from datetime import datetime
+import os
 
 _c = Colorcodes()
 #filesIO = decorate_module(filesIO, debugger(logger, 'filesIO'))
@@ -35,14 +35,18 @@ def never(date=False):
     if date: return datetime.strptime("2998-12-31", r"%Y-%m-%d")
     return "2998-12-31"
 
-def num2str(x):
-    x = str(x)
-    z = 4 - len(x)
+def git_ignore(directory, filename):
+    '''Adds a file of the todo list directory to its .gitignore, once'''
 
-    if z < 0:
-        print('Fatal Error: you reached 10000 tasks. Need to increase names')
+    path = os.path.join(directory, '.gitignore')
+    text = open(path).read() if os.path.isfile(path) else ''
+    if f'/{filename}' in text.splitlines(): return
+    separator = '\n' if text and not text.endswith('\n') else ''
+    with open(path, 'a') as f: f.write(f'{separator}/{filename}\n')
 
-    return '0'*z + x
+def num2str(x):
+    '''The name of the task or project numbered x: at least 4 digits, zero-padded'''
+    return f'{int(x):04d}'
 
 def diff_dates(d1, d2):
     d1 = datetime.strptime(d1, r"%Y-%m-%d")
@@ -0,0 +1,138 @@
+import os, struct, ctypes, ctypes.util
+from .storage import KINDS, JsonStorage
+
+# inotify(7)
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_FROM = 0x040
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_Q_OVERFLOW = 0x4000
+IN_ISDIR = 0x40000000
+MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+EVENT = struct.Struct('iIII')     # wd, mask, cookie, length of the name that follows
+
+_libc = None
+
+
+def libc():
+    '''The C library, if it has inotify'''
+
+    global _libc
+    if _libc is None:
+        try:
+            _libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+            _libc.inotify_init1
+        except (OSError, AttributeError):
+            _libc = False
+    return _libc or None
+
+
+def entity(filename):
+    '''(kind, name) of a task or project file name, None for other files'''
+
+    name, _, kind = filename.rpartition('.')
+    return (kind, name) if kind in KINDS else None
+
+
+class Watcher():
+    '''Tells which tasks and projects changed on disk since the last call
+
+    Uses inotify where available, on the todo list directory and its
+    subdirectories (shards), otherwise compares the storage fingerprints at
+    each call. It cannot tell which entities changed in a database, or when
+    the inotify queue overflowed: changes() returns None then.
+    '''
+
+    def __init__(self, storage):
+        self.storage = storage
+        self.fd = None
+        self.directories = {}       # watch descriptor: directory
+        self.fingerprints = None
+
+        if isinstance(storage, JsonStorage) and libc() is not None:
+            self.fd = libc().inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+            if self.fd < 0 or self._watch(storage.path) is None:
+                self.close()
+
+        if self.fd is None: self.fingerprints = storage.fingerprints()
+
+
+    def __str__(self):
+        return f'<Watcher {self.storage.path}>'
+
+
+    def __repr__(self):
+        return f'<Watcher {self.storage.path}>'
+
+
+    def _watch(self, directory):
+        '''Watches a directory and its subdirectories, hidden ones (e.g. .git) excepted
+
+        Returns the entities found in them, None if a watch could not be
+        added (e.g. too many directories).
+        '''
+
+        wd = libc().inotify_add_watch(self.fd, os.fsencode(directory), MASK)
+        if wd < 0: return None
+        self.directories[wd] = directory
+
+        found = set()
+        try: entries = list(os.scandir(directory))
+        except OSError: return None     # removed in the meantime
+
+        for entry in entries:
+            if not entry.is_dir():
+                if entity(entry.name): found.add(entity(entry.name))
+            elif not entry.name.startswith('.'):
+                inside = self._watch(entry.path)
+                if inside is None: return None
+                found |= inside
+        return found
+
+
+    def changes(self):
+        '''The (kind, name) of the entities changed since the last call, None if unknown'''
+
+        if self.fd is not None: return self._events()
+
+        old, new = self.fingerprints, self.storage.fingerprints()
+        self.fingerprints = new
+        if not isinstance(self.storage, JsonStorage): return set() if old == new else None
+
+        return {(kind, name) for kind in KINDS
+            for name in old[kind].keys() | new[kind].keys() if old[kind].get(name) != new[kind].get(name)}
+
+
+    def _events(self):
+        changed, unknown = set(), False
+        while True:
+            try: data = os.read(self.fd, 64*1024)
+            except BlockingIOError: break
+
+            i = 0
+            while i < len(data):
+                wd, mask, _, length = EVENT.unpack_from(data, i)
+                name = os.fsdecode(data[i + EVENT.size:i + EVENT.size + length].rstrip(b'\0'))
+                i += EVENT.size + length
+
+                if mask & IN_Q_OVERFLOW: unknown = True
+                if wd not in self.directories: continue
+
+                if mask & IN_ISDIR:
+                    # A new shard: its files may have been written before the watch was added
+                    if mask & (IN_CREATE | IN_MOVED_TO) and not name.startswith('.'):
+                        found = self._watch(os.path.join(self.directories[wd], name))
+                        if found is None: unknown = True
+                        else: changed |= found
+                    continue
+
+                if mask & IN_CREATE: continue     # reported when written
+                if entity(name): changed.add(entity(name))
+
+        return None if unknown else changed
+
+
+    def close(self):
+        if self.fd is not None and self.fd >= 0: os.close(self.fd)
+        self.fd = None